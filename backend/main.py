@@ -28,16 +28,30 @@ from routers import memory, search, agents
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize services on startup, cleanup on shutdown."""
+    from services.http_client import init_http_clients, close_http_clients
+    from services.agent_roster import roster_registry
+    from services.search_cache import init_search_cache, close_search_cache
+    from services.job_service import init_job_store, close_job_store
     from services.mem0_service import init_mem0
-    from services.supermemory_service import init_supermemory
+    from services.supermemory_service import init_supermemory, close_supermemory
 
+    print("🌐 Opening upstream HTTP connection pools...")
+    await init_http_clients()
+    await init_search_cache()
     print("🧠 Initializing mem0 memory system...")
     await init_mem0()
     print("👤 Initializing SuperMemory user profiles...")
     await init_supermemory()
+    await init_job_store()
+    roster_registry.start_watching()
     print("✅ Backend services ready!")
     yield
     print("🔒 Shutting down backend services...")
+    roster_registry.stop_watching()
+    await close_job_store()
+    await close_supermemory()
+    await close_search_cache()
+    await close_http_clients()
 
 
 app = FastAPI(
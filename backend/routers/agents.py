@@ -2,16 +2,19 @@
 Agents Router — Multi-AI Collaboration
 """
 
-from typing import Optional
+from typing import Literal, Optional
 from pydantic import BaseModel
 from fastapi import APIRouter
 from fastapi.responses import StreamingResponse
 
 from services.agent_service import (
     orchestrate_collaboration,
-    select_agents,
-    AGENT_ROSTER,
+    stream_collaboration,
+    get_collaboration_cache_stats,
 )
+from services.agent_roster import roster_registry
+from services.job_service import submit_collaboration_job, get_job, cancel_job
+from services.xai_scheduler import xai_scheduler
 
 import json
 
@@ -22,6 +25,18 @@ class CollaborateRequest(BaseModel):
     query: str
     num_agents: Optional[int] = None  # None = auto (defaults to 7, leans 5+)
     conversation_history: Optional[list[dict]] = None
+    # None = auto (batch for 5+, sequential below); "staged" runs parallel waves
+    mode: Optional[Literal["sequential", "batch", "staged"]] = None
+    wave_sizes: Optional[list[int]] = None  # staged: agents per wave, e.g. [4, 3]
+    depends_on: Optional[dict[str, list[str]]] = None  # staged: agent id -> ids it builds on
+    # "shared_prefix" puts history + query before the persona so batch agents share a cached prefix
+    prompt_layout: Literal["persona_first", "shared_prefix"] = "persona_first"
+    # Quorum: synthesize once this many agents answered / the deadline hits
+    quorum: Optional[int] = None
+    quorum_deadline_ms: Optional[int] = None
+    late_responses: Literal["drop", "refine"] = "drop"  # "refine" is stream-only
+    synthesis_fan_in: Optional[int] = None  # group size for map-reduce synthesis
+    use_cache: bool = True  # reuse a cached result for an identical collaboration
 
 
 @router.post("/collaborate")
@@ -30,12 +45,22 @@ async def api_collaborate(req: CollaborateRequest):
     Orchestrate multi-AI collaboration.
     - 1-4 agents: sequential processing
     - 5+ agents: batch API processing
+    - mode="staged": parallel waves, later waves see a digest of earlier ones
     Tura 3 synthesizes the final unified answer.
     """
     result = await orchestrate_collaboration(
         query=req.query,
         num_agents=req.num_agents,
         conversation_history=req.conversation_history,
+        mode=req.mode,
+        wave_sizes=req.wave_sizes,
+        depends_on=req.depends_on,
+        prompt_layout=req.prompt_layout,
+        quorum=req.quorum,
+        quorum_deadline_ms=req.quorum_deadline_ms,
+        late_responses=req.late_responses,
+        synthesis_fan_in=req.synthesis_fan_in,
+        use_cache=req.use_cache,
     )
     return result
 
@@ -44,30 +69,26 @@ async def api_collaborate(req: CollaborateRequest):
 async def api_collaborate_stream(req: CollaborateRequest):
     """
     Stream collaboration results as Server-Sent Events.
-    Each agent's response is sent as it completes.
+    Agents stream `agent_delta` tokens tagged by agent id, and each full
+    response is sent as it completes. The synthesis then streams as
+    `synthesis_delta` tokens followed by the full `synthesis`.
     """
     async def event_stream():
-        num = req.num_agents or 7
-        num = max(1, min(25, num))
-        agents = select_agents(req.query, num)
-
-        # Send agent list first
-        yield f"data: {json.dumps({'type': 'agents', 'agents': [{'id': a['id'], 'name': a['name'], 'emoji': a['emoji'], 'specialty': a['specialty']} for a in agents]})}\n\n"
-
-        # Process and stream results
-        result = await orchestrate_collaboration(
+        async for event in stream_collaboration(
             query=req.query,
             num_agents=req.num_agents,
             conversation_history=req.conversation_history,
-        )
-
-        # Stream each agent response
-        for resp in result.get("responses", []):
-            yield f"data: {json.dumps({'type': 'agent_response', 'response': resp})}\n\n"
-
-        # Stream synthesis
-        if result.get("synthesis"):
-            yield f"data: {json.dumps({'type': 'synthesis', 'content': result['synthesis']})}\n\n"
+            mode=req.mode,
+            wave_sizes=req.wave_sizes,
+            depends_on=req.depends_on,
+            prompt_layout=req.prompt_layout,
+            quorum=req.quorum,
+            quorum_deadline_ms=req.quorum_deadline_ms,
+            late_responses=req.late_responses,
+            synthesis_fan_in=req.synthesis_fan_in,
+            use_cache=req.use_cache,
+        ):
+            yield f"data: {json.dumps(event)}\n\n"
 
         yield "data: [DONE]\n\n"
 
@@ -81,19 +102,56 @@ async def api_collaborate_stream(req: CollaborateRequest):
     )
 
 
+@router.post("/jobs")
+async def api_submit_job(req: CollaborateRequest):
+    """
+    Submit a collaboration as a background job.
+    Poll GET /agents/jobs/{job_id} for status and the result.
+    """
+    return await submit_collaboration_job({
+        "query": req.query,
+        "num_agents": req.num_agents,
+        "conversation_history": req.conversation_history,
+        "mode": req.mode,
+        "wave_sizes": req.wave_sizes,
+        "depends_on": req.depends_on,
+        "prompt_layout": req.prompt_layout,
+        "quorum": req.quorum,
+        "quorum_deadline_ms": req.quorum_deadline_ms,
+        "late_responses": req.late_responses,
+        "synthesis_fan_in": req.synthesis_fan_in,
+        "use_cache": req.use_cache,
+    })
+
+
+@router.get("/jobs/{job_id}")
+async def api_get_job(job_id: str):
+    """Get a collaboration job's status, and its result once completed."""
+    job = await get_job(job_id)
+    if not job:
+        return {"job_id": job_id, "exists": False}
+    return {**job, "exists": True}
+
+
+@router.delete("/jobs/{job_id}")
+async def api_cancel_job(job_id: str):
+    """Cancel a running collaboration job."""
+    return await cancel_job(job_id)
+
+
 @router.get("/roster")
 async def api_get_roster():
     """Get the full list of available AI agents."""
-    return {
-        "agents": [
-            {
-                "id": a["id"],
-                "name": a["name"],
-                "emoji": a["emoji"],
-                "specialty": a["specialty"],
-            }
-            for a in AGENT_ROSTER
-        ],
-        "total": len(AGENT_ROSTER),
-        "max_per_session": 25,
-    }
+    return roster_registry.snapshot.public
+
+
+@router.get("/scheduler/stats")
+async def api_scheduler_stats():
+    """Current xAI rate limiter state (concurrency cap, queue depth, throttles)."""
+    return xai_scheduler.stats()
+
+
+@router.get("/cache/stats")
+async def api_cache_stats():
+    """Collaboration result cache hit/miss counters."""
+    return get_collaboration_cache_stats()
@@ -4,13 +4,14 @@ Memory Router — Endpoints for mem0 + SuperMemory
 
 from typing import Optional
 from pydantic import BaseModel
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 
 from services.mem0_service import add_memory, search_memories, get_all_memories, delete_memory
 from services.supermemory_service import (
     get_user_profile,
     upsert_user_profile,
     add_user_fact,
+    add_user_facts,
     get_user_facts,
     delete_user_fact,
     build_user_context,
@@ -43,6 +44,15 @@ class UserFactRequest(BaseModel):
     content: str
     importance: int = 5
 
+class FactItem(BaseModel):
+    category: str
+    content: str
+    importance: int = 5
+
+class UserFactsRequest(BaseModel):
+    user_id: str
+    facts: list[FactItem]
+
 
 # ─── mem0 Endpoints ───────────────────────────────────────────────────────────
 
@@ -101,11 +111,29 @@ async def api_add_user_fact(req: UserFactRequest):
     return {"success": True, "fact": result}
 
 
+@router.post("/user/facts")
+async def api_add_user_facts(req: UserFactsRequest):
+    """Add many facts about a user in one transaction (e.g. importing history)."""
+    result = await add_user_facts(req.user_id, [f.model_dump() for f in req.facts])
+    return {"success": True, "facts": result, "count": len(result)}
+
+
 @router.get("/user/{user_id}/facts")
-async def api_get_user_facts(user_id: str, category: Optional[str] = None):
-    """Get facts about a user."""
-    facts = await get_user_facts(user_id, category)
-    return {"facts": facts, "count": len(facts)}
+async def api_get_user_facts(
+    user_id: str,
+    category: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+):
+    """
+    Get facts about a user, most important first. All of them by default;
+    pass `limit` to page, then `next_cursor` from the response as `cursor`.
+    """
+    try:
+        page = await get_user_facts(user_id, category, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**page, "count": len(page["facts"])}
 
 
 @router.delete("/user/fact/{fact_id}")
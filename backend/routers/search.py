@@ -2,11 +2,19 @@
 Search Router — Dual Web Search (xAI + Exa)
 """
 
-from typing import Optional
+import json
+from typing import Literal, Optional
 from pydantic import BaseModel
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 
-from services.search_service import search_xai, search_exa, search_combined
+from services.search_service import (
+    search_xai,
+    search_exa,
+    search_combined,
+    stream_search_combined,
+    get_search_cache_stats,
+)
 
 router = APIRouter()
 
@@ -15,6 +23,11 @@ class SearchRequest(BaseModel):
     query: str
     num_results: int = 10
     category: Optional[str] = None
+    deadline_ms: Optional[int] = None  # Latency budget for /combined
+    min_results: Optional[int] = None  # Return early once this many results arrive
+    ranking: Literal["rrf", "weighted"] = "rrf"
+    source_weights: Optional[dict[str, float]] = None  # e.g. {"exa": 1.0, "xai": 0.5}
+    top_k: Optional[int] = None  # Defaults to num_results * 2
 
 
 @router.post("/xai")
@@ -35,5 +48,48 @@ async def api_search_firecrawl(req: SearchRequest):
 @router.post("/combined")
 async def api_search_combined(req: SearchRequest):
     """Run dual search (xAI + Exa) in parallel, merge and deduplicate results."""
-    result = await search_combined(req.query, req.num_results, req.category)
+    result = await search_combined(
+        req.query,
+        req.num_results,
+        req.category,
+        deadline_ms=req.deadline_ms,
+        min_results=req.min_results,
+        ranking=req.ranking,
+        source_weights=req.source_weights,
+        top_k=req.top_k,
+    )
     return result
+
+
+@router.post("/combined/stream")
+async def api_search_combined_stream(req: SearchRequest):
+    """
+    Stream combined search as Server-Sent Events.
+    Each provider's results are sent as soon as it returns, deduplicated
+    against URLs already sent, followed by a `summary` event.
+    """
+    async def event_stream():
+        async for event in stream_search_combined(
+            req.query,
+            req.num_results,
+            req.category,
+            deadline_ms=req.deadline_ms,
+        ):
+            yield f"data: {json.dumps(event)}\n\n"
+
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        },
+    )
+
+
+@router.get("/cache/stats")
+async def api_search_cache_stats():
+    """Hit/miss counters for the combined-search result cache."""
+    return await get_search_cache_stats()
@@ -0,0 +1,165 @@
+"""
+Agent Roster Registry — Hot-reloadable personas loaded from a data file
+The roster lives in data/agent_roster.json (or AGENT_ROSTER_PATH, JSON or
+YAML). Each load produces an immutable RosterSnapshot holding the agents,
+a precomputed public projection for /agents/roster, and the selection
+index; reloads swap the snapshot atomically so in-flight requests keep
+using the version they started with.
+
+The file is polled for changes every AGENT_ROSTER_RELOAD_INTERVAL seconds
+(default 2). A file that fails to parse or validate is rejected and the
+current roster stays live.
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from services.agent_selection import AgentSelectionIndex
+
+try:
+    import yaml
+    YAML_AVAILABLE = True
+except ImportError:
+    YAML_AVAILABLE = False
+
+ROSTER_PATH = Path(os.getenv(
+    "AGENT_ROSTER_PATH", str(Path(__file__).parent.parent / "data" / "agent_roster.json")
+))
+RELOAD_INTERVAL = float(os.getenv("AGENT_ROSTER_RELOAD_INTERVAL", "2"))
+MAX_AGENTS_PER_SESSION = 25
+
+REQUIRED_FIELDS = ("id", "name", "emoji", "persona", "specialty")
+
+
+@dataclass(frozen=True)
+class RosterSnapshot:
+    version: str
+    revision: int
+    agents: list[dict]
+    by_id: dict[str, dict]
+    public: dict
+    index: AgentSelectionIndex
+    loaded_at: str
+
+
+def _agent_version(agent: dict) -> str:
+    """Content hash of a persona, so caches can tell when an agent changed."""
+    blob = json.dumps({k: agent[k] for k in REQUIRED_FIELDS}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(blob.encode()).hexdigest()[:12]
+
+
+def _parse_roster_file(path: Path) -> dict:
+    text = path.read_text(encoding="utf-8")
+    if path.suffix in (".yaml", ".yml"):
+        if not YAML_AVAILABLE:
+            raise RuntimeError("PyYAML is required for YAML rosters")
+        return yaml.safe_load(text)
+    return json.loads(text)
+
+
+def _validate_agents(agents: list[dict]) -> list[dict]:
+    seen = set()
+    validated = []
+    for agent in agents:
+        missing = [f for f in REQUIRED_FIELDS if not agent.get(f)]
+        if missing:
+            raise ValueError(f"Agent {agent.get('id', '?')} is missing {', '.join(missing)}")
+        if agent["id"] in seen:
+            raise ValueError(f"Duplicate agent id: {agent['id']}")
+        seen.add(agent["id"])
+        validated.append({**agent, "version": _agent_version(agent)})
+    if not validated:
+        raise ValueError("Roster has no agents")
+    return validated
+
+
+class RosterRegistry:
+    """Owns the current roster snapshot and reloads it when the file changes."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._snapshot: Optional[RosterSnapshot] = None
+        self._mtime: Optional[float] = None
+        self._watch_task: Optional[asyncio.Task] = None
+
+    @property
+    def snapshot(self) -> RosterSnapshot:
+        if self._snapshot is None:
+            self.load()
+        return self._snapshot
+
+    def _build(self, data: dict) -> RosterSnapshot:
+        agents = _validate_agents(data.get("agents", []))
+        boosts = [(b["keywords"], b["agents"]) for b in data.get("query_boosts", [])]
+        previous = self._snapshot.index if self._snapshot else None
+        index = AgentSelectionIndex(agents, boosts, previous=previous)
+
+        digest = hashlib.sha1("".join(a["version"] for a in agents).encode()).hexdigest()[:8]
+        version = f"{data['version']}+{digest}" if data.get("version") else digest
+        revision = self._snapshot.revision + 1 if self._snapshot else 1
+
+        public_agents = [
+            {"id": a["id"], "name": a["name"], "emoji": a["emoji"], "specialty": a["specialty"]}
+            for a in agents
+        ]
+        return RosterSnapshot(
+            version=version,
+            revision=revision,
+            agents=agents,
+            by_id={a["id"]: a for a in agents},
+            public={
+                "agents": public_agents,
+                "total": len(agents),
+                "max_per_session": MAX_AGENTS_PER_SESSION,
+                "version": version,
+            },
+            index=index,
+            loaded_at=datetime.utcnow().isoformat(),
+        )
+
+    def load(self):
+        """Blocking load — used once at import and from the reload thread."""
+        mtime = self.path.stat().st_mtime
+        snapshot = self._build(_parse_roster_file(self.path))
+        self._snapshot = snapshot
+        self._mtime = mtime
+
+    async def reload_if_changed(self) -> bool:
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+        if mtime == self._mtime:
+            return False
+        try:
+            # Parse and index in a thread so request handling isn't stalled
+            await asyncio.to_thread(self.load)
+        except Exception as e:
+            self._mtime = mtime  # don't retry a broken file until it changes again
+            print(f"⚠️  Agent roster reload failed, keeping v{self.snapshot.version}: {e}")
+            return False
+        print(f"🔄 Agent roster reloaded: v{self._snapshot.version} ({len(self._snapshot.agents)} agents)")
+        return True
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(RELOAD_INTERVAL)
+            await self.reload_if_changed()
+
+    def start_watching(self):
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch())
+
+    def stop_watching(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+
+
+roster_registry = RosterRegistry(ROSTER_PATH)
@@ -0,0 +1,169 @@
+"""
+Agent Selection Index — Precomputed relevance scoring for select_agents
+Built once per roster:
+- TF-IDF vectors over each agent's name, specialty and persona (numpy
+  matrix, L2-normalized rows), matched on whole words only
+- keyword boost groups ("code", "bug" → Coder, Debugger, ...) as a
+  group × vocabulary indicator matrix
+A query is scored against every agent with matrix-vector products, then
+picked with MMR so the top-k isn't a cluster of near-identical personas.
+
+Rebuilding from a previous index reuses the tokenized terms of every
+agent whose `version` is unchanged, so roster reloads only re-tokenize
+the personas that were edited.
+"""
+
+import re
+from typing import Optional
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "don", "for", "from",
+    "in", "into", "is", "it", "of", "on", "or", "t", "that", "the", "their",
+    "them", "to", "with", "you", "your", "just", "not",
+}
+
+SPECIALTY_WEIGHT = 2.0
+NAME_WEIGHT = 2.0
+PERSONA_WEIGHT = 1.0
+
+RELEVANCE_SCALE = 4.0  # cosine (0-1) → roughly one strong specialty match
+BOOST_SCORE = 3.0      # per triggered keyword group
+MMR_LAMBDA = 0.75      # 1.0 = pure relevance, 0.0 = pure diversity
+
+
+# Crude suffix folding so "secure"/"security", "test"/"testing" meet
+_SUFFIXES = ("ation", "ities", "ity", "ing", "ed", "er", "ly", "es", "s", "e")
+
+
+def _stem(tok: str) -> str:
+    for suffix in _SUFFIXES:
+        if tok.endswith(suffix) and len(tok) - len(suffix) >= 3 and not tok.endswith("ss"):
+            tok = tok[:-len(suffix)]
+            break
+    if len(tok) > 3 and tok[-1] == tok[-2] and tok[-1] not in "aeiou":
+        tok = tok[:-1]
+    return tok
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase whole-word stems with stopwords dropped."""
+    return [_stem(tok) for tok in _TOKEN_RE.findall(text.lower()) if tok not in STOPWORDS]
+
+
+class AgentSelectionIndex:
+    """Immutable scoring index over one version of the agent roster."""
+
+    def __init__(
+        self,
+        roster: list[dict],
+        boosts: Optional[list[tuple[list[str], list[str]]]] = None,
+        previous: Optional["AgentSelectionIndex"] = None,
+    ):
+        self.roster = list(roster)
+        self.boosts = boosts or []
+
+        reusable = previous._term_cache if previous is not None else {}
+        self._term_cache: dict[tuple, dict[str, float]] = {}
+        for agent in self.roster:
+            key = (agent["id"], agent.get("version"))
+            terms = reusable.get(key) if key[1] is not None else None
+            self._term_cache[key] = terms if terms is not None else self._agent_terms(agent)
+        docs = [self._term_cache[(a["id"], a.get("version"))] for a in self.roster]
+        vocab: dict[str, int] = {}
+        for terms in docs:
+            for term in terms:
+                vocab.setdefault(term, len(vocab))
+        for words, _ in self.boosts:
+            for word in words:
+                for term in tokenize(word):
+                    vocab.setdefault(term, len(vocab))
+        self.vocab = vocab
+
+        n, v = len(self.roster), len(vocab)
+        tf = np.zeros((n, v))
+        for i, terms in enumerate(docs):
+            for term, weight in terms.items():
+                tf[i, vocab[term]] = weight
+        df = (tf > 0).sum(axis=0)
+        self.idf = np.log((1 + n) / (1 + df)) + 1.0
+        self.matrix = self._normalize_rows(tf * self.idf)
+
+        # Agent-agent cosine similarity, used for MMR diversity
+        self.similarity = self.matrix @ self.matrix.T
+
+        ids = {a["id"]: i for i, a in enumerate(self.roster)}
+        self.boost_terms = np.zeros((len(self.boosts), v))
+        self.boost_agents = np.zeros((len(self.boosts), n))
+        for g, (words, agent_ids) in enumerate(self.boosts):
+            for word in words:
+                for term in tokenize(word):
+                    self.boost_terms[g, vocab[term]] = 1.0
+            for agent_id in agent_ids:
+                if agent_id in ids:
+                    self.boost_agents[g, ids[agent_id]] = 1.0
+
+    @staticmethod
+    def _agent_terms(agent: dict) -> dict[str, float]:
+        terms: dict[str, float] = {}
+        for field, weight in (
+            ("name", NAME_WEIGHT),
+            ("specialty", SPECIALTY_WEIGHT),
+            ("persona", PERSONA_WEIGHT),
+        ):
+            for tok in tokenize(agent.get(field, "")):
+                terms[tok] = terms.get(tok, 0.0) + weight
+        return terms
+
+    @staticmethod
+    def _normalize_rows(m: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(m, axis=1, keepdims=True)
+        return np.divide(m, norms, out=np.zeros_like(m), where=norms > 0)
+
+    def _query_vector(self, query: str) -> np.ndarray:
+        q = np.zeros(len(self.vocab))
+        for tok in tokenize(query):
+            idx = self.vocab.get(tok)
+            if idx is not None:
+                q[idx] += 1.0
+        return q
+
+    def scores(self, query: str) -> np.ndarray:
+        """Relevance of every agent to the query, in roster order."""
+        q = self._query_vector(query)
+        relevance = np.zeros(len(self.roster))
+        qw = q * self.idf
+        norm = np.linalg.norm(qw)
+        if norm > 0:
+            relevance = self.matrix @ (qw / norm)
+        triggered = (self.boost_terms @ q > 0).astype(np.float64)
+        return RELEVANCE_SCALE * relevance + BOOST_SCORE * (triggered @ self.boost_agents)
+
+    def select(self, query: str, k: int) -> list[dict]:
+        """Top-k agents by MMR over relevance and agent similarity."""
+        n = len(self.roster)
+        k = max(0, min(k, n))
+        if k == 0:
+            return []
+
+        rel = self.scores(query)
+        top = rel.max()
+        rel = rel / top if top > 0 else rel
+
+        chosen: list[int] = []
+        available = np.ones(n, dtype=bool)
+        max_sim = np.zeros(n)
+        for _ in range(k):
+            mmr = MMR_LAMBDA * rel - (1 - MMR_LAMBDA) * max_sim
+            mmr[~available] = -np.inf
+            pick = int(np.argmax(mmr))  # ties resolve to roster order
+            chosen.append(pick)
+            available[pick] = False
+            max_sim = np.maximum(max_sim, self.similarity[:, pick])
+        return [self.roster[i] for i in chosen]
+
+    def __len__(self) -> int:
+        return len(self.roster)
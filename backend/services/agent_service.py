@@ -12,10 +12,15 @@ import os
 import asyncio
 import json
 import uuid
-import httpx
+import hashlib
 from typing import Optional
 from datetime import datetime
 
+from services.agent_roster import roster_registry
+from services.cache import TTLCache, SingleFlight
+from services.history_compaction import compact_history
+from services.xai_scheduler import xai_scheduler
+
 # Try to import xai_sdk for batch API
 try:
     from xai_sdk import Client as XAIClient
@@ -26,234 +31,229 @@ except ImportError:
 
 
 # ─── Agent Personas ───────────────────────────────────────────────────────────
+# Personas and keyword boosts live in data/agent_roster.json and are
+# hot-reloaded by services.agent_roster.
 
-AGENT_ROSTER = [
-    {
-        "id": "analyst",
-        "name": "Analyst",
-        "emoji": "📊",
-        "persona": "You are a sharp Data Analyst. Break down information with data-driven insights, statistics, and comparisons. Be precise and quantitative.",
-        "specialty": "Data analysis, statistics, comparisons",
-    },
-    {
-        "id": "coder",
-        "name": "Coder",
-        "emoji": "💻",
-        "persona": "You are an expert Software Engineer. Provide clean, production-quality code with best practices. Focus on architecture, patterns, and implementation details.",
-        "specialty": "Code generation, debugging, architecture",
-    },
-    {
-        "id": "researcher",
-        "name": "Researcher",
-        "emoji": "🔬",
-        "persona": "You are a thorough Academic Researcher. Provide deep, well-cited analysis. Consider multiple perspectives and present evidence-based conclusions.",
-        "specialty": "Deep research, citations, thorough analysis",
-    },
-    {
-        "id": "creative",
-        "name": "Creative",
-        "emoji": "🎨",
-        "persona": "You are a Creative Writer and Ideator. Think outside the box, brainstorm novel solutions, and present ideas in engaging, imaginative ways.",
-        "specialty": "Brainstorming, ideation, storytelling",
-    },
-    {
-        "id": "critic",
-        "name": "Critic",
-        "emoji": "🔍",
-        "persona": "You are a Devil's Advocate. Challenge assumptions, identify weaknesses, find edge cases, and stress-test ideas. Be constructively critical.",
-        "specialty": "Challenging assumptions, finding flaws",
-    },
-    {
-        "id": "planner",
-        "name": "Planner",
-        "emoji": "📋",
-        "persona": "You are a Project Manager. Structure tasks into clear action items, timelines, and milestones. Focus on execution and deliverables.",
-        "specialty": "Task structure, timelines, action items",
-    },
-    {
-        "id": "security",
-        "name": "Security",
-        "emoji": "🛡️",
-        "persona": "You are a Security Expert. Identify risks, vulnerabilities, and potential threats. Suggest mitigations and best practices for safety.",
-        "specialty": "Risk assessment, vulnerabilities, mitigations",
-    },
-    {
-        "id": "ux",
-        "name": "UX Designer",
-        "emoji": "🎯",
-        "persona": "You are a UX Designer. Focus on user experience, accessibility, design thinking, and human-centered approaches to problem-solving.",
-        "specialty": "User experience, design thinking",
-    },
-    {
-        "id": "optimizer",
-        "name": "Optimizer",
-        "emoji": "⚡",
-        "persona": "You are a Performance Expert. Find efficiency improvements, optimize workflows, reduce redundancy, and suggest faster approaches.",
-        "specialty": "Efficiency, optimization, performance",
-    },
-    {
-        "id": "educator",
-        "name": "Educator",
-        "emoji": "📚",
-        "persona": "You are a Patient Educator. Explain complex concepts simply, use analogies, and ensure deep understanding. Teach, don't just tell.",
-        "specialty": "Teaching, simplification, analogies",
-    },
-    {
-        "id": "ethicist",
-        "name": "Ethicist",
-        "emoji": "⚖️",
-        "persona": "You are an Ethics Advisor. Consider moral implications, fairness, bias, and social impact. Ensure responsible and ethical approaches.",
-        "specialty": "Ethics, fairness, social impact",
-    },
-    {
-        "id": "strategist",
-        "name": "Strategist",
-        "emoji": "♟️",
-        "persona": "You are a Strategic Thinker. Look at the big picture, identify long-term implications, competitive advantages, and strategic opportunities.",
-        "specialty": "Strategy, long-term thinking, competitive analysis",
-    },
-    {
-        "id": "debugger",
-        "name": "Debugger",
-        "emoji": "🐛",
-        "persona": "You are a Debugging Expert. Systematically identify root causes, trace issues, and provide clear fix steps. Think methodically.",
-        "specialty": "Root cause analysis, systematic debugging",
-    },
-    {
-        "id": "architect",
-        "name": "Architect",
-        "emoji": "🏗️",
-        "persona": "You are a Systems Architect. Design scalable, maintainable systems. Focus on component boundaries, data flow, and integration patterns.",
-        "specialty": "System design, scalability, architecture",
-    },
-    {
-        "id": "writer",
-        "name": "Writer",
-        "emoji": "✍️",
-        "persona": "You are a Technical Writer. Create clear, well-structured documentation. Focus on readability, completeness, and proper formatting.",
-        "specialty": "Documentation, clarity, structure",
-    },
-    {
-        "id": "devops",
-        "name": "DevOps",
-        "emoji": "🚀",
-        "persona": "You are a DevOps Engineer. Focus on deployment, CI/CD, infrastructure, monitoring, and operational excellence.",
-        "specialty": "Deployment, infrastructure, automation",
-    },
-    {
-        "id": "data_eng",
-        "name": "Data Engineer",
-        "emoji": "🔧",
-        "persona": "You are a Data Engineer. Focus on data pipelines, storage, processing, and ensuring data quality and accessibility.",
-        "specialty": "Data pipelines, storage, ETL",
-    },
-    {
-        "id": "ml_eng",
-        "name": "ML Engineer",
-        "emoji": "🤖",
-        "persona": "You are an ML Engineer. Focus on model selection, training approaches, evaluation metrics, and practical ML applications.",
-        "specialty": "Machine learning, model training, evaluation",
-    },
-    {
-        "id": "product",
-        "name": "Product Manager",
-        "emoji": "📱",
-        "persona": "You are a Product Manager. Focus on user needs, feature prioritization, market fit, and building the right thing for the right audience.",
-        "specialty": "Product strategy, user needs, prioritization",
-    },
-    {
-        "id": "legal",
-        "name": "Legal Advisor",
-        "emoji": "📜",
-        "persona": "You are a Legal Advisor. Consider regulations, compliance, intellectual property, and legal implications of decisions.",
-        "specialty": "Regulations, compliance, IP",
-    },
-    {
-        "id": "financial",
-        "name": "Financial Analyst",
-        "emoji": "💰",
-        "persona": "You are a Financial Analyst. Focus on cost-benefit analysis, budgeting, ROI calculations, and financial viability.",
-        "specialty": "Financial analysis, ROI, budgeting",
-    },
-    {
-        "id": "accessibility",
-        "name": "Accessibility Expert",
-        "emoji": "♿",
-        "persona": "You are an Accessibility Expert. Ensure inclusive design, WCAG compliance, and solutions that work for everyone regardless of ability.",
-        "specialty": "Accessibility, inclusive design, WCAG",
-    },
-    {
-        "id": "localization",
-        "name": "Localization Expert",
-        "emoji": "🌍",
-        "persona": "You are a Localization Expert. Consider internationalization, cultural sensitivity, translation needs, and global audience adaptation.",
-        "specialty": "i18n, cultural adaptation, translation",
-    },
-    {
-        "id": "testing",
-        "name": "QA Engineer",
-        "emoji": "✅",
-        "persona": "You are a QA Engineer. Focus on test coverage, edge cases, regression testing, and quality assurance strategies.",
-        "specialty": "Testing, quality assurance, edge cases",
-    },
-    {
-        "id": "mentor",
-        "name": "Mentor",
-        "emoji": "🧙",
-        "persona": "You are a Senior Mentor. Provide wisdom, guidance, career advice, and help others grow. Share lessons learned from experience.",
-        "specialty": "Mentorship, wisdom, growth guidance",
-    },
-]
+def get_roster() -> list[dict]:
+    """Agents in the current roster version."""
+    return roster_registry.snapshot.agents
 
 
 def select_agents(query: str, num_agents: int) -> list[dict]:
     """
     Intelligently select the most relevant agents for a given query.
     Tura 3 always selects, aiming for 5+ agents when beneficial.
+    Scoring uses the roster's precomputed TF-IDF / keyword-boost index,
+    with MMR so the picks cover different angles.
+    """
+    return roster_registry.snapshot.index.select(query, num_agents)
+
+
+# ─── xAI Chat Helpers ─────────────────────────────────────────────────────────
+
+XAI_CHAT_PATH = "/v1/chat/completions"
+AGENT_MODEL = "grok-3-mini"
+AGENT_TEMPERATURE = 0.7
+SYNTHESIS_MODEL = "grok-4-1-fast-reasoning"
+REDUCE_MODEL = os.getenv("SYNTHESIS_REDUCE_MODEL", AGENT_MODEL)
+
+# Above this many agent responses, synthesis goes map-reduce: groups of
+# SYNTHESIS_FAN_IN responses are summarized in parallel with REDUCE_MODEL
+# and SYNTHESIS_MODEL only sees the group summaries
+SYNTHESIS_FAN_IN = int(os.getenv("SYNTHESIS_FAN_IN", "5"))
+HIERARCHICAL_SYNTHESIS_THRESHOLD = int(os.getenv("HIERARCHICAL_SYNTHESIS_THRESHOLD", "10"))
+
+# "persona_first": persona system prompt, then history and query (default)
+# "shared_prefix": shared instructions, history and query first, persona last,
+#   so every agent's request shares one cacheable prompt prefix
+PROMPT_LAYOUTS = ("persona_first", "shared_prefix")
+
+
+def _xai_headers(api_key: str, cache_key: Optional[str] = None) -> dict:
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+    if cache_key:
+        # Routes requests with the same prefix to the same prompt cache
+        headers["x-grok-conv-id"] = cache_key
+    return headers
+
+
+def _usage_summary(usage: Optional[dict]) -> Optional[dict]:
+    """Token counts from an upstream `usage` block, including cached prompt tokens."""
+    if not usage:
+        return None
+    return {
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "completion_tokens": usage.get("completion_tokens", 0),
+        "cached_tokens": (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0),
+    }
+
+
+def _usage_totals(responses: list[dict]) -> dict:
+    totals = {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+    for r in responses:
+        for k, v in (r.get("usage") or {}).items():
+            totals[k] += v
+    return totals
+
+
+def _agent_card(agent: dict) -> dict:
+    """Public projection of an agent sent to clients."""
+    return {
+        "id": agent["id"],
+        "name": agent["name"],
+        "emoji": agent["emoji"],
+        "specialty": agent["specialty"],
+    }
+
+
+def _agent_result(agent: dict, content: str, usage: Optional[dict] = None) -> dict:
+    result = {
+        "agent": _agent_card(agent),
+        "content": content,
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+    if usage:
+        result["usage"] = usage
+    return result
+
+
+def _agent_error(agent: dict, error: Exception) -> dict:
+    return {
+        "agent": {
+            "id": agent["id"],
+            "name": agent["name"],
+            "emoji": agent["emoji"],
+        },
+        "content": f"Error: {str(error)}",
+        "error": True,
+    }
+
+
+async def _call_agent(
+    agent: dict,
+    messages: list[dict],
+    api_key: str,
+    on_delta=None,
+    cache_key: Optional[str] = None,
+) -> dict:
+    """
+    Run one agent's chat completion and wrap it as a collaboration response.
+    With `on_delta`, the completion is streamed and each token is passed to
+    `on_delta(agent_id, text)` as it arrives. `cache_key` is sent upstream
+    so agents sharing a prompt prefix hit the same prompt cache.
+    """
+    payload = {
+        "model": AGENT_MODEL,
+        "messages": messages,
+        "max_tokens": 1500,
+        "temperature": AGENT_TEMPERATURE,
+    }
+    try:
+        if on_delta is None:
+            resp = await xai_scheduler.post(
+                XAI_CHAT_PATH,
+                timeout=120.0,
+                headers=_xai_headers(api_key, cache_key),
+                json=payload,
+            )
+            resp.raise_for_status()
+            data = resp.json()
+            content = data["choices"][0]["message"]["content"]
+            usage = data.get("usage")
+        else:
+            parts = []
+            usage = {}
+            async for delta in _iter_chat_deltas(payload, api_key, usage_out=usage, cache_key=cache_key):
+                parts.append(delta)
+                on_delta(agent["id"], delta)
+            content = "".join(parts)
+        return _agent_result(agent, content, _usage_summary(usage))
+    except Exception as e:
+        return _agent_error(agent, e)
+
+
+async def _iter_chat_deltas(
+    payload: dict,
+    api_key: str,
+    usage_out: Optional[dict] = None,
+    cache_key: Optional[str] = None,
+):
     """
-    query_lower = query.lower()
-
-    # Keyword-based relevance scoring
-    scores = []
-    for agent in AGENT_ROSTER:
-        score = 0
-        specialty_words = agent["specialty"].lower().split(", ")
-        for word in specialty_words:
-            if any(w in query_lower for w in word.split()):
-                score += 2
-
-        # Boost certain agents for common query types
-        if any(w in query_lower for w in ["code", "program", "function", "bug", "error"]):
-            if agent["id"] in ["coder", "debugger", "architect", "testing"]:
-                score += 3
-        if any(w in query_lower for w in ["design", "ui", "ux", "interface"]):
-            if agent["id"] in ["ux", "creative", "accessibility"]:
-                score += 3
-        if any(w in query_lower for w in ["plan", "strategy", "roadmap"]):
-            if agent["id"] in ["planner", "strategist", "product"]:
-                score += 3
-        if any(w in query_lower for w in ["security", "risk", "vulnerable"]):
-            if agent["id"] in ["security", "critic"]:
-                score += 3
-        if any(w in query_lower for w in ["data", "analytics", "metrics"]):
-            if agent["id"] in ["analyst", "data_eng", "ml_eng"]:
-                score += 3
-        if any(w in query_lower for w in ["learn", "explain", "understand", "how"]):
-            if agent["id"] in ["educator", "mentor"]:
-                score += 3
-
-        # Base score for diversity
-        score += 1
-        scores.append((agent, score))
-
-    # Sort by relevance, take top N
-    scores.sort(key=lambda x: x[1], reverse=True)
-    selected = [s[0] for s in scores[:min(num_agents, len(AGENT_ROSTER))]]
-    return selected
+    Stream a chat completion (`stream: true`) and yield content deltas.
+    When `usage_out` is given it's filled with the final usage block.
+    """
+    body = {**payload, "stream": True}
+    if usage_out is not None:
+        body["stream_options"] = {"include_usage": True}
+    async with xai_scheduler.stream(
+        XAI_CHAT_PATH,
+        timeout=120.0,
+        headers=_xai_headers(api_key, cache_key),
+        json=body,
+    ) as resp:
+        resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            chunk = json.loads(data)
+            if usage_out is not None and chunk.get("usage"):
+                usage_out.update(chunk["usage"])
+            choices = chunk.get("choices") or [{}]
+            delta = choices[0].get("delta", {}).get("content")
+            if delta:
+                yield delta
 
 
 # ─── Sequential Collaboration (1-4 agents) ────────────────────────────────────
 
+def _sequential_messages(
+    query: str,
+    agent: dict,
+    context_accumulator: str,
+    conversation_history: list[dict] = None,
+) -> list[dict]:
+    system_prompt = (
+        f"{agent['persona']}\n\n"
+        f"You are collaborating with other AI agents to answer a question. "
+        f"The user asked: \"{query}\"\n"
+    )
+    if context_accumulator:
+        system_prompt += (
+            f"\nPrevious agents have shared these insights:\n{context_accumulator}\n\n"
+            f"Build on their work — add your unique perspective as {agent['name']}. "
+            f"Don't repeat what others said; contribute new value."
+        )
+
+    messages = [{"role": "system", "content": system_prompt}]
+    if conversation_history:
+        messages.extend(conversation_history)
+    messages.append({"role": "user", "content": query})
+    return messages
+
+
+async def _iter_sequential(
+    query: str,
+    agents: list[dict],
+    conversation_history: list[dict],
+    api_key: str,
+    on_delta=None,
+):
+    """Yield each agent's response in turn, feeding earlier insights forward."""
+    context_accumulator = ""
+    for agent in agents:
+        messages = _sequential_messages(query, agent, context_accumulator, conversation_history)
+        result = await _call_agent(agent, messages, api_key, on_delta)
+        if not result.get("error"):
+            context_accumulator += f"\n{agent['name']}: {result['content'][:500]}\n"
+        yield result
+
+
 async def collaborate_sequential(
     query: str,
     agents: list[dict],
@@ -264,68 +264,7 @@ async def collaborate_sequential(
     if not api_key:
         return {"error": "XAI_API_KEY not configured"}
 
-    results = []
-    context_accumulator = ""
-
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        for agent in agents:
-            system_prompt = (
-                f"{agent['persona']}\n\n"
-                f"You are collaborating with other AI agents to answer a question. "
-                f"The user asked: \"{query}\"\n"
-            )
-            if context_accumulator:
-                system_prompt += (
-                    f"\nPrevious agents have shared these insights:\n{context_accumulator}\n\n"
-                    f"Build on their work — add your unique perspective as {agent['name']}. "
-                    f"Don't repeat what others said; contribute new value."
-                )
-
-            messages = [{"role": "system", "content": system_prompt}]
-            if conversation_history:
-                messages.extend(conversation_history)
-            messages.append({"role": "user", "content": query})
-
-            try:
-                resp = await client.post(
-                    "https://api.x.ai/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "model": "grok-3-mini",
-                        "messages": messages,
-                        "max_tokens": 1500,
-                        "temperature": 0.7,
-                    },
-                )
-                resp.raise_for_status()
-                data = resp.json()
-                content = data["choices"][0]["message"]["content"]
-
-                results.append({
-                    "agent": {
-                        "id": agent["id"],
-                        "name": agent["name"],
-                        "emoji": agent["emoji"],
-                        "specialty": agent["specialty"],
-                    },
-                    "content": content,
-                    "timestamp": datetime.utcnow().isoformat(),
-                })
-                context_accumulator += f"\n{agent['name']}: {content[:500]}\n"
-
-            except Exception as e:
-                results.append({
-                    "agent": {
-                        "id": agent["id"],
-                        "name": agent["name"],
-                        "emoji": agent["emoji"],
-                    },
-                    "content": f"Error: {str(e)}",
-                    "error": True,
-                })
+    results = [r async for r in _iter_sequential(query, agents, conversation_history, api_key)]
 
     return {
         "mode": "sequential",
@@ -336,25 +275,172 @@ async def collaborate_sequential(
     }
 
 
+# ─── Agent Response Cache ─────────────────────────────────────────────────────
+# Individual agent answers, so collaborations that overlap (e.g. 5 vs 7
+# agents on the same question) only call upstream for the new agents.
+# Keyed on agent id + persona version, normalized query, history, model
+# and temperature bucket; the agent count in the prompt is deliberately
+# left out so overlapping rosters can share answers.
+
+AGENT_CACHE_TTL = float(os.getenv("AGENT_CACHE_TTL", "600"))
+AGENT_CACHE_MAX_ENTRIES = int(os.getenv("AGENT_CACHE_MAX_ENTRIES", "2048"))
+
+_agent_response_cache = TTLCache(max_entries=AGENT_CACHE_MAX_ENTRIES, ttl=AGENT_CACHE_TTL)
+
+
+def _agent_response_key(agent: dict, query: str, conversation_history: list[dict] = None) -> tuple:
+    query_hash = hashlib.sha256(" ".join(query.lower().split()).encode()).hexdigest()[:32]
+    history_hash = hashlib.sha256(
+        json.dumps(conversation_history or [], sort_keys=True, ensure_ascii=False).encode()
+    ).hexdigest()[:32]
+    return (
+        agent["id"],
+        agent.get("version"),
+        query_hash,
+        history_hash,
+        AGENT_MODEL,
+        round(AGENT_TEMPERATURE, 1),
+    )
+
+
+def _cached_agent_response(agent: dict, query: str, conversation_history: list[dict] = None) -> Optional[dict]:
+    """A cached answer from this agent, marked `cached` and without usage (no tokens were spent)."""
+    cached = _agent_response_cache.get(_agent_response_key(agent, query, conversation_history))
+    if cached is None:
+        return None
+    replay = {k: v for k, v in cached.items() if k != "usage"}
+    replay["cached"] = True
+    return replay
+
+
+def _remember_agent_response(
+    agent: dict,
+    query: str,
+    conversation_history: list[dict],
+    response: dict,
+) -> dict:
+    if not response.get("error"):
+        _agent_response_cache.set(_agent_response_key(agent, query, conversation_history), response)
+    return response
+
+
+async def _replay_agent_response(response: dict, on_delta=None) -> dict:
+    if on_delta is not None:
+        on_delta(response["agent"]["id"], response["content"])
+    return response
+
+
+async def _call_agent_cached(
+    agent: dict,
+    query: str,
+    conversation_history: list[dict],
+    call,
+) -> dict:
+    return _remember_agent_response(agent, query, conversation_history, await call)
+
+
 # ─── Batch Collaboration (5+ agents) ──────────────────────────────────────────
 
+def _prefix_cache_key(query: str, conversation_history: list[dict] = None) -> str:
+    """Stable key for the prompt prefix shared by every agent in a collaboration."""
+    blob = json.dumps([conversation_history or [], query], sort_keys=True, ensure_ascii=False)
+    return f"hefai-collab-{hashlib.sha256(blob.encode()).hexdigest()[:32]}"
+
+
+def _batch_messages(
+    query: str,
+    agent: dict,
+    agent_count: int,
+    conversation_history: list[dict] = None,
+    layout: str = "persona_first",
+) -> list[dict]:
+    if layout == "shared_prefix":
+        messages = [{
+            "role": "system",
+            "content": (
+                f"You are one of {agent_count} AI agents collaborating to answer a question. "
+                f"Your persona is given at the end of the conversation."
+            ),
+        }]
+        if conversation_history:
+            messages.extend(conversation_history)
+        messages.append({"role": "user", "content": query})
+        messages.append({
+            "role": "system",
+            "content": (
+                f"{agent['persona']}\n\n"
+                f"Provide your unique perspective as {agent['name']}. Be thorough but concise."
+            ),
+        })
+        return messages
+
+    system_prompt = (
+        f"{agent['persona']}\n\n"
+        f"You are one of {agent_count} AI agents collaborating to answer a question. "
+        f"Provide your unique perspective as {agent['name']}. Be thorough but concise."
+    )
+    messages = [{"role": "system", "content": system_prompt}]
+    if conversation_history:
+        messages.extend(conversation_history)
+    messages.append({"role": "user", "content": query})
+    return messages
+
+
 async def collaborate_batch(
     query: str,
     agents: list[dict],
     conversation_history: list[dict] = None,
+    prompt_layout: str = "persona_first",
+    use_cache: bool = True,
 ) -> dict:
     """
     Run 5+ agents using xAI batch API for parallel processing.
     Falls back to parallel HTTP calls if xai_sdk isn't available.
+    `use_cache=False` skips the per-agent response cache entirely.
     """
     api_key = os.getenv("XAI_API_KEY", "")
     if not api_key:
         return {"error": "XAI_API_KEY not configured"}
 
     if XAI_SDK_AVAILABLE:
-        return await _batch_via_sdk(query, agents, conversation_history, api_key)
+        result = await _batch_via_sdk(query, agents, conversation_history, api_key, prompt_layout, use_cache)
     else:
-        return await _batch_via_http(query, agents, conversation_history, api_key)
+        result = await _batch_via_http(query, agents, conversation_history, api_key, prompt_layout, use_cache)
+
+    result["prompt_cache"] = {
+        "layout": prompt_layout,
+        "cache_key": _prefix_cache_key(query, conversation_history) if prompt_layout == "shared_prefix" else None,
+        **_usage_totals(result["responses"]),
+    }
+    return result
+
+
+def _run_sdk_batch(
+    query: str,
+    agents: list[dict],
+    conversation_history: list[dict],
+    api_key: str,
+    batch_name: str,
+    prompt_layout: str = "persona_first",
+    agent_count: Optional[int] = None,
+) -> list:
+    """Blocking xAI SDK batch round trip — only call from a worker thread."""
+    client = XAIClient(api_key=api_key)
+    batch = client.batch.create(batch_name=batch_name)
+
+    # Add each agent as a batch item
+    for agent in agents:
+        batch.add(
+            model=AGENT_MODEL,
+            messages=_batch_messages(
+                query, agent, agent_count or len(agents), conversation_history, prompt_layout
+            ),
+            max_tokens=1500,
+            metadata={"agent_id": agent["id"]},
+        )
+
+    # Execute batch
+    return batch.execute()
 
 
 async def _batch_via_sdk(
@@ -362,60 +448,75 @@ async def _batch_via_sdk(
     agents: list[dict],
     conversation_history: list[dict],
     api_key: str,
+    prompt_layout: str = "persona_first",
+    use_cache: bool = True,
 ) -> dict:
-    """Use xAI SDK batch API."""
+    """
+    Use xAI SDK batch API (run in a thread so the event loop stays free).
+    Only agents without a cached response go into the batch.
+    """
     try:
-        client = XAIClient(api_key=api_key)
         batch_name = f"hefai_collab_{uuid.uuid4().hex[:8]}"
-        batch = client.batch.create(batch_name=batch_name)
-
-        # Add each agent as a batch item
-        for agent in agents:
-            system_prompt = (
-                f"{agent['persona']}\n\n"
-                f"You are one of {len(agents)} AI agents collaborating to answer a question. "
-                f"Provide your unique perspective as {agent['name']}. Be thorough but concise."
-            )
-            messages = [{"role": "system", "content": system_prompt}]
-            if conversation_history:
-                messages.extend(conversation_history)
-            messages.append({"role": "user", "content": query})
-
-            batch.add(
-                model="grok-3-mini",
-                messages=messages,
-                max_tokens=1500,
-                metadata={"agent_id": agent["id"]},
+        results = {
+            a["id"]: _cached_agent_response(a, query, conversation_history) if use_cache else None
+            for a in agents
+        }
+        misses = [a for a in agents if results[a["id"]] is None]
+        if misses:
+            batch_results = await asyncio.to_thread(
+                _run_sdk_batch, query, misses, conversation_history, api_key, batch_name,
+                prompt_layout, len(agents),
             )
-
-        # Execute batch
-        batch_results = batch.execute()
-
-        results = []
-        for i, (agent, result) in enumerate(zip(agents, batch_results)):
-            content = result.get("choices", [{}])[0].get("message", {}).get("content", "No response")
-            results.append({
-                "agent": {
-                    "id": agent["id"],
-                    "name": agent["name"],
-                    "emoji": agent["emoji"],
-                    "specialty": agent["specialty"],
-                },
-                "content": content,
-                "timestamp": datetime.utcnow().isoformat(),
-            })
+            for agent, result in zip(misses, batch_results):
+                content = result.get("choices", [{}])[0].get("message", {}).get("content", "No response")
+                response = _agent_result(agent, content, _usage_summary(result.get("usage")))
+                if use_cache:
+                    _remember_agent_response(agent, query, conversation_history, response)
+                results[agent["id"]] = response
 
         return {
             "mode": "batch",
             "batch_id": batch_name,
             "query": query,
             "agent_count": len(agents),
-            "responses": results,
+            "responses": [results[a["id"]] for a in agents],
             "timestamp": datetime.utcnow().isoformat(),
         }
     except Exception as e:
         print(f"Batch API error: {e}, falling back to HTTP")
-        return await _batch_via_http(query, agents, conversation_history, api_key)
+        return await _batch_via_http(query, agents, conversation_history, api_key, prompt_layout, use_cache)
+
+
+def _batch_calls(
+    query: str,
+    agents: list[dict],
+    conversation_history: list[dict],
+    api_key: str,
+    prompt_layout: str,
+    on_delta=None,
+    use_cache: bool = True,
+) -> list:
+    """
+    One coroutine per agent, sharing a cache key in shared_prefix layout.
+    Agents with a cached response are replayed instead of called upstream;
+    with `use_cache=False` every agent is called and nothing is stored.
+    """
+    cache_key = _prefix_cache_key(query, conversation_history) if prompt_layout == "shared_prefix" else None
+    calls = []
+    for agent in agents:
+        cached = _cached_agent_response(agent, query, conversation_history) if use_cache else None
+        if cached is not None:
+            calls.append(_replay_agent_response(cached, on_delta))
+            continue
+        call = _call_agent(
+            agent,
+            _batch_messages(query, agent, len(agents), conversation_history, prompt_layout),
+            api_key,
+            on_delta,
+            cache_key,
+        )
+        calls.append(_call_agent_cached(agent, query, conversation_history, call) if use_cache else call)
+    return calls
 
 
 async def _batch_via_http(
@@ -423,62 +524,13 @@ async def _batch_via_http(
     agents: list[dict],
     conversation_history: list[dict],
     api_key: str,
+    prompt_layout: str = "persona_first",
+    use_cache: bool = True,
 ) -> dict:
     """Fallback: run all agents in parallel via HTTP."""
-
-    async def call_agent(agent: dict) -> dict:
-        system_prompt = (
-            f"{agent['persona']}\n\n"
-            f"You are one of {len(agents)} AI agents collaborating to answer a question. "
-            f"Provide your unique perspective as {agent['name']}. Be thorough but concise."
-        )
-        messages = [{"role": "system", "content": system_prompt}]
-        if conversation_history:
-            messages.extend(conversation_history)
-        messages.append({"role": "user", "content": query})
-
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            try:
-                resp = await client.post(
-                    "https://api.x.ai/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "model": "grok-3-mini",
-                        "messages": messages,
-                        "max_tokens": 1500,
-                        "temperature": 0.7,
-                    },
-                )
-                resp.raise_for_status()
-                data = resp.json()
-                content = data["choices"][0]["message"]["content"]
-                return {
-                    "agent": {
-                        "id": agent["id"],
-                        "name": agent["name"],
-                        "emoji": agent["emoji"],
-                        "specialty": agent["specialty"],
-                    },
-                    "content": content,
-                    "timestamp": datetime.utcnow().isoformat(),
-                }
-            except Exception as e:
-                return {
-                    "agent": {
-                        "id": agent["id"],
-                        "name": agent["name"],
-                        "emoji": agent["emoji"],
-                    },
-                    "content": f"Error: {str(e)}",
-                    "error": True,
-                }
-
-    # Run all in parallel
-    tasks = [call_agent(agent) for agent in agents]
-    results = await asyncio.gather(*tasks)
+    results = await asyncio.gather(
+        *_batch_calls(query, agents, conversation_history, api_key, prompt_layout, use_cache=use_cache)
+    )
 
     return {
         "mode": "batch_http",
@@ -489,23 +541,232 @@ async def _batch_via_http(
     }
 
 
-# ─── Synthesize Final Answer ──────────────────────────────────────────────────
+async def _iter_batch_http(
+    query: str,
+    agents: list[dict],
+    conversation_history: list[dict],
+    api_key: str,
+    on_delta=None,
+    prompt_layout: str = "persona_first",
+    use_cache: bool = True,
+):
+    """Run all agents in parallel via HTTP, yielding each response as it finishes."""
+    tasks = [
+        asyncio.create_task(call)
+        for call in _batch_calls(
+            query, agents, conversation_history, api_key, prompt_layout, on_delta, use_cache
+        )
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away mid-stream — don't leave orphaned upstream calls
+        for task in tasks:
+            task.cancel()
 
-async def synthesize_responses(
+
+# ─── Staged Collaboration (parallel waves) ────────────────────────────────────
+
+STAGED_DIGEST_CHARS = 300
+
+
+def _plan_waves(
+    agents: list[dict],
+    wave_sizes: Optional[list[int]] = None,
+    depends_on: Optional[dict[str, list[str]]] = None,
+) -> list[list[dict]]:
+    """
+    Split agents into waves that run in parallel.
+    - depends_on: each agent runs in the first wave after all its
+      dependencies (unknown ids are ignored, cycles land in a final wave)
+    - wave_sizes: fixed wave sizes; the last size repeats for leftovers
+    - neither: two waves, the first half feeding the second
+    """
+    if depends_on:
+        ids = {a["id"] for a in agents}
+        deps = {a["id"]: set(depends_on.get(a["id"], [])) & ids for a in agents}
+        waves, done, remaining = [], set(), list(agents)
+        while remaining:
+            ready = [a for a in remaining if deps[a["id"]] <= done]
+            if not ready:
+                ready = remaining
+            waves.append(ready)
+            done |= {a["id"] for a in ready}
+            remaining = [a for a in remaining if a["id"] not in done]
+        return waves
+
+    sizes = [s for s in (wave_sizes or []) if s > 0] or [max(1, len(agents) // 2), len(agents)]
+    waves, start, i = [], 0, 0
+    while start < len(agents):
+        size = sizes[min(i, len(sizes) - 1)]
+        waves.append(agents[start:start + size])
+        start += size
+        i += 1
+    return waves
+
+
+def _wave_digest(results: list[dict]) -> str:
+    """Compact summary of earlier agents for later waves to build on."""
+    return "".join(
+        f"\n{r['agent']['name']}: {r['content'][:STAGED_DIGEST_CHARS]}\n"
+        for r in results if not r.get("error")
+    )
+
+
+async def _iter_staged(
     query: str,
-    collaboration_result: dict,
-) -> str:
-    """Tura 3 synthesizes all agent responses into a unified answer."""
+    waves: list[list[dict]],
+    conversation_history: list[dict],
+    api_key: str,
+    on_delta=None,
+    depends_on: Optional[dict[str, list[str]]] = None,
+):
+    """Run each wave in parallel, yielding responses as they finish."""
+    finished: dict[str, dict] = {}
+    for wave in waves:
+        tasks = []
+        for agent in wave:
+            if depends_on:
+                earlier = [finished[d] for d in depends_on.get(agent["id"], []) if d in finished]
+            else:
+                earlier = list(finished.values())
+            messages = _sequential_messages(query, agent, _wave_digest(earlier), conversation_history)
+            tasks.append(asyncio.create_task(_call_agent(agent, messages, api_key, on_delta)))
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                finished[result["agent"]["id"]] = result
+                yield result
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+async def collaborate_staged(
+    query: str,
+    agents: list[dict],
+    conversation_history: list[dict] = None,
+    wave_sizes: Optional[list[int]] = None,
+    depends_on: Optional[dict[str, list[str]]] = None,
+) -> dict:
+    """
+    Run agents in parallel waves; each wave sees a digest of earlier waves
+    (or only of its dependencies when a graph is given).
+    """
     api_key = os.getenv("XAI_API_KEY", "")
     if not api_key:
-        return "Error: XAI_API_KEY not configured"
+        return {"error": "XAI_API_KEY not configured"}
 
-    responses = collaboration_result.get("responses", [])
-    agent_inputs = "\n\n".join([
+    waves = _plan_waves(agents, wave_sizes, depends_on)
+    results = [
+        r async for r in _iter_staged(query, waves, conversation_history, api_key, depends_on=depends_on)
+    ]
+
+    return {
+        "mode": "staged",
+        "query": query,
+        "agent_count": len(agents),
+        "waves": [[a["id"] for a in wave] for wave in waves],
+        "responses": results,
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
+
+# ─── Synthesize Final Answer ──────────────────────────────────────────────────
+
+def _format_agent_inputs(responses: list[dict]) -> str:
+    return "\n\n".join([
         f"### {r['agent']['emoji']} {r['agent']['name']}:\n{r['content']}"
         for r in responses if not r.get("error")
     ])
 
+
+def _reduce_request(query: str, group: list[dict]) -> dict:
+    return {
+        "model": REDUCE_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": (
+                    "You condense a group of AI agents' answers for a lead synthesizer. "
+                    "Keep every distinct insight, recommendation and caveat, note where the "
+                    "agents agree or disagree, and attribute points to agents by name. "
+                    "Drop repetition and filler. Be concise."
+                ),
+            },
+            {
+                "role": "user",
+                "content": (
+                    f"Original question: {query}\n\n"
+                    f"Agent responses:\n{_format_agent_inputs(group)}"
+                ),
+            },
+        ],
+        "max_tokens": 1200,
+        "temperature": 0.3,
+    }
+
+
+async def _reduce_group(query: str, group: list[dict], label: str, api_key: str) -> list[dict]:
+    """Summarize one group into a single pseudo-response; on failure pass the group through."""
+    if len(group) < 2:
+        return group  # a leftover single response has nothing to merge with
+    try:
+        resp = await xai_scheduler.post(
+            XAI_CHAT_PATH,
+            timeout=120.0,
+            headers=_xai_headers(api_key),
+            json=_reduce_request(query, group),
+        )
+        resp.raise_for_status()
+        content = resp.json()["choices"][0]["message"]["content"]
+    except Exception as e:
+        print(f"⚠️  Synthesis group {label} reduce failed, passing responses through: {e}")
+        return group
+    names = ", ".join(r["agent"]["name"] for r in group)
+    return [{
+        "agent": {"id": f"group-{label}", "name": f"Group {label} ({names})", "emoji": "🧩"},
+        "content": content,
+        "members": [r["agent"]["id"] for r in group],
+    }]
+
+
+async def _reduce_responses(
+    query: str,
+    responses: list[dict],
+    api_key: str,
+    fan_in: Optional[int] = None,
+) -> list[dict]:
+    """
+    Map step of hierarchical synthesis. Responses at or under the threshold
+    are returned unchanged; otherwise groups of `fan_in` are reduced in
+    parallel, level by level, until at most `fan_in` summaries remain.
+    """
+    fan_in = max(2, fan_in or SYNTHESIS_FAN_IN)
+    current = [r for r in responses if not r.get("error")]
+    if len(current) <= max(HIERARCHICAL_SYNTHESIS_THRESHOLD, fan_in):
+        return responses
+
+    level = 1
+    while len(current) > fan_in:
+        groups = [current[i:i + fan_in] for i in range(0, len(current), fan_in)]
+        reduced = await asyncio.gather(*[
+            _reduce_group(query, group, f"{level}.{i + 1}", api_key)
+            for i, group in enumerate(groups)
+        ])
+        nxt = [r for group in reduced for r in group]
+        if len(nxt) >= len(current):
+            break  # every reduce failed; don't loop forever
+        current = nxt
+        level += 1
+    return current
+
+
+def _synthesis_request(query: str, responses: list[dict]) -> dict:
+    """Build the synthesis payload."""
+    agent_inputs = _format_agent_inputs(responses)
+
     system_prompt = (
         "You are Tura 3, the lead AI orchestrator. Multiple AI agents have shared their perspectives "
         "on the user's question. Your job is to:\n"
@@ -516,68 +777,545 @@ async def synthesize_responses(
         "5. Credit individual agents when referencing their specific insights\n\n"
         "Be thorough, well-structured, and provide the best possible answer."
     )
+    if any(r.get("members") for r in responses):
+        system_prompt += (
+            "\n\nSome inputs are condensed summaries of a group of agents; "
+            "the group heading lists which agents it covers."
+        )
+
+    payload = {
+        "model": SYNTHESIS_MODEL,  # Use the best model for synthesis
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {
+                "role": "user",
+                "content": (
+                    f"Original question: {query}\n\n"
+                    f"Agent responses:\n{agent_inputs}"
+                ),
+            },
+        ],
+        "max_tokens": 4000,
+        "temperature": 0.5,
+    }
+    return payload
+
+
+async def synthesize_responses(
+    query: str,
+    collaboration_result: dict,
+    fan_in: Optional[int] = None,
+) -> str:
+    """
+    Tura 3 synthesizes all agent responses into a unified answer.
+    Large agent counts are reduced hierarchically first (see _reduce_responses).
+    """
+    api_key = os.getenv("XAI_API_KEY", "")
+    if not api_key:
+        return "Error: XAI_API_KEY not configured"
+
+    responses = collaboration_result.get("responses", [])
+    payload = _synthesis_request(query, await _reduce_responses(query, responses, api_key, fan_in))
+
+    try:
+        resp = await xai_scheduler.post(
+            XAI_CHAT_PATH,
+            timeout=120.0,
+            headers=_xai_headers(api_key),
+            json=payload,
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        return data["choices"][0]["message"]["content"]
+    except Exception as e:
+        return f"Synthesis error: {str(e)}\n\nRaw agent responses:\n{_format_agent_inputs(responses)}"
+
+
+async def stream_synthesis(query: str, responses: list[dict], fan_in: Optional[int] = None):
+    """Like synthesize_responses, but yields the answer token by token."""
+    api_key = os.getenv("XAI_API_KEY", "")
+    if not api_key:
+        yield "Error: XAI_API_KEY not configured"
+        return
+
+    payload = _synthesis_request(query, await _reduce_responses(query, responses, api_key, fan_in))
+    emitted = False
+    try:
+        async for delta in _iter_chat_deltas(payload, api_key):
+            emitted = True
+            yield delta
+    except Exception as e:
+        if emitted:
+            yield f"\n\n[Synthesis interrupted: {str(e)}]"
+        else:
+            yield f"Synthesis error: {str(e)}\n\nRaw agent responses:\n{_format_agent_inputs(responses)}"
+
+
+def _refinement_request(query: str, synthesis: str, late_responses: list[dict]) -> dict:
+    late_inputs = _format_agent_inputs(late_responses)
+    return {
+        "model": SYNTHESIS_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": (
+                    "You are Tura 3, the lead AI orchestrator. You already answered the user's question "
+                    "from the first agents to respond. More agents have now weighed in. Refine your "
+                    "answer: fold in their new insights, fix anything they contradict, and credit them. "
+                    "Return the complete refined answer."
+                ),
+            },
+            {
+                "role": "user",
+                "content": (
+                    f"Original question: {query}\n\n"
+                    f"Your previous answer:\n{synthesis}\n\n"
+                    f"Additional agent responses:\n{late_inputs}"
+                ),
+            },
+        ],
+        "max_tokens": 4000,
+        "temperature": 0.5,
+    }
 
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        try:
-            resp = await client.post(
-                "https://api.x.ai/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": "grok-4-1-fast-reasoning",  # Use the best model for synthesis
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {
-                            "role": "user",
-                            "content": (
-                                f"Original question: {query}\n\n"
-                                f"Agent responses:\n{agent_inputs}"
-                            ),
-                        },
-                    ],
-                    "max_tokens": 4000,
-                    "temperature": 0.5,
-                },
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            return data["choices"][0]["message"]["content"]
-        except Exception as e:
-            return f"Synthesis error: {str(e)}\n\nRaw agent responses:\n{agent_inputs}"
+
+async def stream_refinement(query: str, synthesis: str, late_responses: list[dict]):
+    """Stream a refined synthesis that folds in agents who missed the quorum."""
+    api_key = os.getenv("XAI_API_KEY", "")
+    if not api_key:
+        return
+    try:
+        async for delta in _iter_chat_deltas(_refinement_request(query, synthesis, late_responses), api_key):
+            yield delta
+    except Exception as e:
+        yield f"\n\n[Refinement interrupted: {str(e)}]"
+
+
+# ─── Collaboration Cache ──────────────────────────────────────────────────────
+# Whole collaboration results, keyed on everything that shapes the answer:
+# query, selected agents (with persona versions), compacted history and
+# model settings. Concurrent identical requests share one run.
+
+COLLAB_CACHE_TTL = float(os.getenv("COLLAB_CACHE_TTL", "600"))
+COLLAB_CACHE_MAX_ENTRIES = int(os.getenv("COLLAB_CACHE_MAX_ENTRIES", "256"))
+
+_collab_cache = TTLCache(max_entries=COLLAB_CACHE_MAX_ENTRIES, ttl=COLLAB_CACHE_TTL)
+_collab_flight = SingleFlight()
+
+
+def _collaboration_cache_key(
+    query: str,
+    selected: list[dict],
+    conversation_history: Optional[list[dict]],
+    settings: dict,
+) -> str:
+    blob = json.dumps(
+        {
+            "query": " ".join(query.split()),
+            "agents": [(a["id"], a.get("version")) for a in selected],
+            "history": conversation_history or [],
+            "settings": settings,
+            "models": [AGENT_MODEL, SYNTHESIS_MODEL, REDUCE_MODEL],
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def _is_cacheable(result: dict) -> bool:
+    """Only cache clean runs, so a transient upstream error isn't replayed."""
+    if result.get("error") or any(r.get("error") for r in result.get("responses", [])):
+        return False
+    synthesis = result.get("synthesis") or ""
+    return bool(synthesis) and not synthesis.startswith(("Error:", "Synthesis error:")) \
+        and "[Synthesis interrupted:" not in synthesis
+
+
+def get_collaboration_cache_stats() -> dict:
+    """Hit/miss counters for the collaboration and per-agent response caches."""
+    return {
+        **_collab_cache.stats(),
+        "coalesced": _collab_flight.coalesced,
+        "agent_responses": _agent_response_cache.stats(),
+    }
 
 
 # ─── Main Orchestration ───────────────────────────────────────────────────────
 
+def _resolve_agent_count(num_agents: Optional[int]) -> int:
+    # Default to 7 agents (leans towards 5+), clamped to 1-25
+    if num_agents is None:
+        num_agents = 7
+    return max(1, min(25, num_agents))
+
+
+def _resolve_mode(
+    mode: Optional[str],
+    agent_count: int,
+    wave_sizes: Optional[list[int]] = None,
+    depends_on: Optional[dict[str, list[str]]] = None,
+) -> str:
+    if mode:
+        return mode
+    if wave_sizes or depends_on:
+        return "staged"
+    return "batch" if agent_count >= 5 else "sequential"
+
+
+def _iter_agents(
+    mode: str,
+    query: str,
+    selected: list[dict],
+    conversation_history: list[dict],
+    api_key: str,
+    on_delta=None,
+    wave_sizes: Optional[list[int]] = None,
+    depends_on: Optional[dict[str, list[str]]] = None,
+    prompt_layout: str = "persona_first",
+    use_cache: bool = True,
+):
+    """Agent responses for `mode`, yielded as each one finishes."""
+    if mode == "staged":
+        waves = _plan_waves(selected, wave_sizes, depends_on)
+        return _iter_staged(query, waves, conversation_history, api_key, on_delta, depends_on)
+    if mode == "batch":
+        return _iter_batch_http(
+            query, selected, conversation_history, api_key, on_delta, prompt_layout, use_cache
+        )
+    return _iter_sequential(query, selected, conversation_history, api_key, on_delta)
+
+
+async def collaborate_quorum(
+    query: str,
+    agents: list[dict],
+    conversation_history: list[dict],
+    mode: str,
+    quorum: Optional[int] = None,
+    quorum_deadline_ms: Optional[int] = None,
+    wave_sizes: Optional[list[int]] = None,
+    depends_on: Optional[dict[str, list[str]]] = None,
+    prompt_layout: str = "persona_first",
+    use_cache: bool = True,
+) -> dict:
+    """
+    Run agents until `quorum` of them have answered or the deadline hits,
+    then cancel the rest. Late responses are dropped.
+    """
+    api_key = os.getenv("XAI_API_KEY", "")
+    if not api_key:
+        return {"error": "XAI_API_KEY not configured"}
+
+    needed = min(quorum or len(agents), len(agents))
+    loop = asyncio.get_running_loop()
+    deadline = None if quorum_deadline_ms is None else loop.time() + quorum_deadline_ms / 1000
+
+    agent_stream = _iter_agents(
+        mode, query, agents, conversation_history, api_key,
+        wave_sizes=wave_sizes, depends_on=depends_on, prompt_layout=prompt_layout,
+        use_cache=use_cache,
+    )
+    results = []
+    answered = 0
+    timed_out = False
+    try:
+        # Failed agents don't count toward the quorum; keep waiting for answers
+        while answered < needed:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                resp = await asyncio.wait_for(agent_stream.__anext__(), timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                break
+            except StopAsyncIteration:
+                break
+            results.append(resp)
+            if not resp.get("error"):
+                answered += 1
+    finally:
+        # Cancels whatever agents are still running
+        await agent_stream.aclose()
+
+    return {
+        "mode": mode,
+        "query": query,
+        "agent_count": len(agents),
+        "responses": results,
+        "quorum": _quorum_summary(agents, results, needed, timed_out),
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
+
+QUORUM_EMPTY_ERROR = "No agent answered before the quorum deadline"
+
+
+def _has_answers(responses: list[dict]) -> bool:
+    return any(not r.get("error") for r in responses)
+
+
+def _quorum_summary(agents: list[dict], responses: list[dict], needed: int, timed_out: bool) -> dict:
+    included = [r["agent"]["id"] for r in responses if not r.get("error")]
+    failed = [r["agent"]["id"] for r in responses if r.get("error")]
+    return {
+        "required": needed,
+        "included": included,
+        "failed": failed,
+        "excluded": [a["id"] for a in agents if a["id"] not in included and a["id"] not in failed],
+        "timed_out": timed_out,
+    }
+
+
 async def orchestrate_collaboration(
     query: str,
     num_agents: Optional[int] = None,
     conversation_history: list[dict] = None,
+    mode: Optional[str] = None,
+    wave_sizes: Optional[list[int]] = None,
+    depends_on: Optional[dict[str, list[str]]] = None,
+    prompt_layout: str = "persona_first",
+    quorum: Optional[int] = None,
+    quorum_deadline_ms: Optional[int] = None,
+    late_responses: str = "drop",
+    synthesis_fan_in: Optional[int] = None,
+    use_cache: bool = True,
 ) -> dict:
     """
     Main entry point for multi-AI collaboration.
     Tura 3 decides how many agents to invite (defaults to 5+).
-    Uses batch API for 5+ agents, sequential for 1-4.
+    Long conversation history is compacted once before fan-out.
+    Uses batch API for 5+ agents, sequential for 1-4, unless `mode`
+    ("sequential", "batch" or "staged") is given. `prompt_layout` picks
+    the batch message layout (see PROMPT_LAYOUTS).
+
+    With `quorum` / `quorum_deadline_ms`, synthesis starts as soon as that
+    many agents answered or the deadline passed. Only the streaming
+    endpoint can refine with late responses; here they're always dropped.
+
+    Above HIERARCHICAL_SYNTHESIS_THRESHOLD responses, synthesis reduces
+    groups of `synthesis_fan_in` (default SYNTHESIS_FAN_IN) agents first.
+
+    Clean results are cached for COLLAB_CACHE_TTL seconds (`use_cache=False`
+    bypasses the cache); cached results come back with `cached: True`.
     """
-    # Default to 7 agents (leans towards 5+)
-    if num_agents is None:
-        num_agents = 7
+    num_agents = _resolve_agent_count(num_agents)
 
-    # Clamp to 1-25
-    num_agents = max(1, min(25, num_agents))
+    # Compact once; every agent shares the same trimmed history
+    conversation_history, history_stats = compact_history(conversation_history)
 
     # Select the best agents for this query
     selected = select_agents(query, num_agents)
 
     # Choose collaboration mode
-    if len(selected) >= 5:
-        result = await collaborate_batch(query, selected, conversation_history)
-    else:
-        result = await collaborate_sequential(query, selected, conversation_history)
+    mode = _resolve_mode(mode, len(selected), wave_sizes, depends_on)
 
-    # Synthesize final answer
-    synthesis = await synthesize_responses(query, result)
-    result["synthesis"] = synthesis
+    async def run() -> dict:
+        if quorum or quorum_deadline_ms:
+            result = await collaborate_quorum(
+                query, selected, conversation_history, mode, quorum, quorum_deadline_ms,
+                wave_sizes, depends_on, prompt_layout, use_cache,
+            )
+        elif mode == "staged":
+            result = await collaborate_staged(query, selected, conversation_history, wave_sizes, depends_on)
+        elif mode == "batch":
+            result = await collaborate_batch(query, selected, conversation_history, prompt_layout, use_cache)
+        else:
+            result = await collaborate_sequential(query, selected, conversation_history)
 
-    return result
+        result["history"] = history_stats
+
+        if "quorum" in result and not _has_answers(result["responses"]):
+            # Nothing made the cut; don't synthesize from an empty prompt
+            result["error"] = QUORUM_EMPTY_ERROR
+            result["synthesis"] = None
+            return result
+
+        # Synthesize final answer
+        synthesis = await synthesize_responses(query, result, synthesis_fan_in)
+        result["synthesis"] = synthesis
+
+        if use_cache and _is_cacheable(result):
+            _collab_cache.set(cache_key, result)
+        return result
+
+    if not use_cache:
+        return {**await run(), "cached": False}
+
+    cache_key = _collaboration_cache_key(query, selected, conversation_history, {
+        "mode": mode, "wave_sizes": wave_sizes, "depends_on": depends_on,
+        "prompt_layout": prompt_layout, "quorum": quorum,
+        "quorum_deadline_ms": quorum_deadline_ms, "synthesis_fan_in": synthesis_fan_in,
+    })
+    cached = _collab_cache.get(cache_key)
+    if cached is not None:
+        return {**cached, "cached": True}
+    return {**await _collab_flight.do(cache_key, run), "cached": False}
+
+
+async def stream_collaboration(
+    query: str,
+    num_agents: Optional[int] = None,
+    conversation_history: list[dict] = None,
+    mode: Optional[str] = None,
+    wave_sizes: Optional[list[int]] = None,
+    depends_on: Optional[dict[str, list[str]]] = None,
+    prompt_layout: str = "persona_first",
+    quorum: Optional[int] = None,
+    quorum_deadline_ms: Optional[int] = None,
+    late_responses: str = "drop",
+    synthesis_fan_in: Optional[int] = None,
+    use_cache: bool = True,
+):
+    """
+    Streaming counterpart of orchestrate_collaboration. Yields event dicts:
+    - agents: the selected roster, sent immediately
+    - agent_delta: partial tokens per agent id, interleaved across agents
+    - agent_response: each agent's full response as soon as it finishes
+    - quorum: which agents made the cut (quorum mode only)
+    - synthesis_delta: synthesis tokens as they arrive
+    - synthesis: the full synthesized answer
+    - refinement_delta / refinement: with late_responses="refine", a
+      refined answer after late agents (flagged `late`) have arrived
+
+    5+ agents always run over parallel HTTP here, since the SDK batch API
+    only returns once every item is done.
+
+    A cached collaboration (see orchestrate_collaboration) is replayed as
+    the same events with `cached: True` on the agents event; a clean live
+    run is cached for later requests. Refine runs bypass the cache.
+    """
+    selected = select_agents(query, _resolve_agent_count(num_agents))
+    mode = _resolve_mode(mode, len(selected), wave_sizes, depends_on)
+    conversation_history, history_stats = compact_history(conversation_history)
+
+    use_quorum = bool(quorum or quorum_deadline_ms)
+    refine = use_quorum and late_responses == "refine"
+    cache_key = None
+    if use_cache and not refine:
+        cache_key = _collaboration_cache_key(query, selected, conversation_history, {
+            "mode": mode, "wave_sizes": wave_sizes, "depends_on": depends_on,
+            "prompt_layout": prompt_layout, "quorum": quorum,
+            "quorum_deadline_ms": quorum_deadline_ms, "synthesis_fan_in": synthesis_fan_in,
+        })
+    cached = _collab_cache.get(cache_key) if cache_key else None
+
+    yield {
+        "type": "agents",
+        "mode": mode,
+        "agents": [_agent_card(a) for a in selected],
+        "history": history_stats,
+        "cached": cached is not None,
+    }
+
+    if cached is not None:
+        for resp in cached["responses"]:
+            yield {"type": "agent_response", "response": resp}
+        if "quorum" in cached:
+            yield {"type": "quorum", **cached["quorum"]}
+        yield {"type": "synthesis_delta", "content": cached["synthesis"]}
+        yield {"type": "synthesis", "content": cached["synthesis"]}
+        return
+
+    api_key = os.getenv("XAI_API_KEY", "")
+    if not api_key:
+        yield {"type": "error", "error": "XAI_API_KEY not configured"}
+        return
+
+    # Agents push deltas and finished responses onto one queue; None marks the end
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def on_delta(agent_id: str, delta: str):
+        queue.put_nowait({"type": "agent_delta", "agent_id": agent_id, "content": delta})
+
+    async def pump_agents():
+        agent_stream = _iter_agents(
+            mode, query, selected, conversation_history, api_key, on_delta,
+            wave_sizes, depends_on, prompt_layout, use_cache,
+        )
+        async for resp in agent_stream:
+            queue.put_nowait({"type": "agent_response", "response": resp})
+
+    producer = asyncio.create_task(pump_agents())
+    producer.add_done_callback(lambda _: queue.put_nowait(None))
+
+    def producer_error() -> Optional[BaseException]:
+        # Only meaningful once the None sentinel has arrived
+        return None if producer.cancelled() else producer.exception()
+
+    needed = min(quorum or len(selected), len(selected))
+    loop = asyncio.get_running_loop()
+    deadline = None if quorum_deadline_ms is None else loop.time() + quorum_deadline_ms / 1000
+
+    responses = []
+    answered = 0
+    timed_out = False
+    agents_done = False
+    try:
+        while answered < needed:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                break
+            if event is None:
+                if (exc := producer_error()) is not None:
+                    yield {"type": "error", "error": str(exc)}
+                    return
+                agents_done = True
+                break
+            if event["type"] == "agent_response":
+                responses.append(event["response"])
+                if not event["response"].get("error"):
+                    answered += 1
+            yield event
+
+        if not refine:
+            producer.cancel()
+        quorum_info = _quorum_summary(selected, responses, needed, timed_out) if use_quorum else None
+        if quorum_info:
+            yield {"type": "quorum", **quorum_info}
+            if not _has_answers(responses):
+                yield {"type": "error", "error": QUORUM_EMPTY_ERROR}
+                return
+
+        parts = []
+        async for delta in stream_synthesis(query, responses, synthesis_fan_in):
+            parts.append(delta)
+            yield {"type": "synthesis_delta", "content": delta}
+        synthesis = "".join(parts)
+        yield {"type": "synthesis", "content": synthesis}
+
+        if cache_key:
+            result = {
+                "mode": mode,
+                "query": query,
+                "agent_count": len(selected),
+                "responses": responses,
+                "timestamp": datetime.utcnow().isoformat(),
+                "history": history_stats,
+                "synthesis": synthesis,
+            }
+            if quorum_info:
+                result["quorum"] = quorum_info
+            if _is_cacheable(result):
+                _collab_cache.set(cache_key, result)
+
+        if refine:
+            # Late agents kept running during synthesis; their events were queued
+            late = []
+            while not agents_done and (event := await queue.get()) is not None:
+                if event["type"] == "agent_response":
+                    late.append(event["response"])
+                    event = {**event, "late": True}
+                yield event
+            if (exc := producer_error()) is not None:
+                yield {"type": "error", "error": str(exc)}
+                return
+            if any(not r.get("error") for r in late):
+                parts = []
+                async for delta in stream_refinement(query, synthesis, late):
+                    parts.append(delta)
+                    yield {"type": "refinement_delta", "content": delta}
+                yield {"type": "refinement", "content": "".join(parts)}
+    finally:
+        producer.cancel()
@@ -0,0 +1,84 @@
+"""
+History Compaction — Shrink conversation history before agent fan-out
+Runs once per collaboration; the compacted history is then shared by every
+agent instead of copying the full transcript into each request.
+
+- The last HISTORY_KEEP_TURNS messages are kept verbatim (default 6)
+- Older messages are condensed into one system message that fits
+  HISTORY_TOKEN_BUDGET estimated tokens (default 1500), favouring the
+  most recent of them
+Token counts use a local ~4 characters/token estimate, no tokenizer call.
+"""
+
+import os
+from typing import Optional
+
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "6"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+
+CHARS_PER_TOKEN = 4
+MIN_TOKENS_PER_TURN = 24
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap BPE-ish estimate: about four characters per token."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _message_text(message: dict) -> str:
+    content = message.get("content", "")
+    if isinstance(content, list):
+        # Multimodal messages: keep only the text parts
+        content = " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+    return " ".join(str(content).split())
+
+
+def _history_tokens(history: list[dict]) -> int:
+    return sum(estimate_tokens(_message_text(m)) + MESSAGE_OVERHEAD_TOKENS for m in history)
+
+
+def compact_history(
+    history: Optional[list[dict]],
+    keep_turns: int = HISTORY_KEEP_TURNS,
+    token_budget: int = HISTORY_TOKEN_BUDGET,
+) -> tuple[Optional[list[dict]], dict]:
+    """
+    Return (compacted history, stats). History that already fits is
+    returned unchanged.
+    """
+    if not history:
+        return history, {"compacted": False, "messages": 0, "estimated_tokens": 0}
+
+    before = _history_tokens(history)
+    older = history[:-keep_turns] if keep_turns > 0 else list(history)
+    recent = history[-keep_turns:] if keep_turns > 0 else []
+    if not older or _history_tokens(older) <= token_budget:
+        return history, {"compacted": False, "messages": len(history), "estimated_tokens": before}
+
+    # Give each older turn an equal share; drop the oldest until shares are useful
+    kept = list(older)
+    while len(kept) > 1 and token_budget // len(kept) < MIN_TOKENS_PER_TURN:
+        kept.pop(0)
+    share_chars = (token_budget // len(kept) - MESSAGE_OVERHEAD_TOKENS) * CHARS_PER_TOKEN
+
+    lines = []
+    for message in kept:
+        text = _message_text(message)
+        if len(text) > share_chars:
+            text = text[:max(0, share_chars - 1)].rstrip() + "…"
+        lines.append(f"{message.get('role', 'user').capitalize()}: {text}")
+
+    dropped = len(older) - len(kept)
+    header = "Earlier conversation (condensed"
+    header += f", {dropped} older messages omitted):" if dropped else "):"
+    summary = {"role": "system", "content": header + "\n" + "\n".join(lines)}
+
+    compacted = [summary] + recent
+    return compacted, {
+        "compacted": True,
+        "messages": len(history),
+        "compacted_messages": len(compacted),
+        "estimated_tokens": before,
+        "compacted_estimated_tokens": _history_tokens(compacted),
+    }
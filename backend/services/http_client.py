@@ -0,0 +1,90 @@
+"""
+HTTP Client Registry — Shared pooled connections for upstream APIs
+One keep-alive httpx.AsyncClient per upstream host (xAI, Exa, Firecrawl),
+created in the FastAPI lifespan and closed on shutdown.
+
+Pool limits are configurable via environment:
+- HTTP_MAX_CONNECTIONS (default 100)
+- HTTP_MAX_KEEPALIVE (default 20)
+- HTTP_KEEPALIVE_EXPIRY seconds (default 30)
+- HTTP2_ENABLED (default true, requires the `h2` package)
+"""
+
+import os
+from typing import Optional
+
+import httpx
+
+# HTTP/2 needs the optional `h2` package (installed via httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+    print("⚠️  h2 not available — upstream clients will use HTTP/1.1")
+
+
+XAI_BASE_URL = "https://api.x.ai"
+EXA_BASE_URL = "https://api.exa.ai"
+FIRECRAWL_BASE_URL = "https://api.firecrawl.dev"
+
+# Upstream host -> whether it negotiates HTTP/2
+UPSTREAMS = {
+    XAI_BASE_URL: True,
+    EXA_BASE_URL: True,
+    FIRECRAWL_BASE_URL: True,
+}
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30")),
+    )
+
+
+def _http2_enabled(base_url: str) -> bool:
+    if not HTTP2_AVAILABLE:
+        return False
+    if os.getenv("HTTP2_ENABLED", "true").lower() in ("0", "false", "no"):
+        return False
+    return UPSTREAMS.get(base_url, False)
+
+
+def _create_client(base_url: str) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=base_url,
+        http2=_http2_enabled(base_url),
+        limits=_pool_limits(),
+        timeout=httpx.Timeout(120.0, connect=10.0),
+    )
+
+
+async def init_http_clients():
+    """Create one pooled client per upstream host."""
+    for base_url in UPSTREAMS:
+        if base_url not in _clients:
+            _clients[base_url] = _create_client(base_url)
+    print(f"✅ HTTP client pools ready ({len(_clients)} hosts, http2={HTTP2_AVAILABLE})")
+
+
+async def close_http_clients():
+    """Close all pooled clients and drop their connections."""
+    for client in list(_clients.values()):
+        await client.aclose()
+    _clients.clear()
+
+
+def get_http_client(base_url: str) -> httpx.AsyncClient:
+    """
+    Get the shared client for an upstream host.
+    Lazily creates one if the lifespan hasn't run (scripts, tests).
+    """
+    client: Optional[httpx.AsyncClient] = _clients.get(base_url)
+    if client is None or client.is_closed:
+        client = _create_client(base_url)
+        _clients[base_url] = client
+    return client
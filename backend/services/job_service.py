@@ -0,0 +1,209 @@
+"""
+Job Service — Background collaboration jobs
+Long collaborations (e.g. 25-agent batches) can be submitted as jobs and
+collected later instead of holding an HTTP connection open.
+
+Jobs run in-process at background xAI priority; their status and results
+are persisted in SQLite so they survive a client disconnect and can be
+read from any worker.
+
+Each job records the worker that owns it (pid + per-boot id). Owners
+refresh `updated_at` on their live jobs every JOB_HEARTBEAT_INTERVAL
+seconds; a queued/running job whose heartbeat is older than
+JOB_LEASE_SECONDS belonged to a worker that died and is marked failed.
+"""
+
+import os
+import json
+import uuid
+import asyncio
+import aiosqlite
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from services.agent_service import orchestrate_collaboration
+from services.xai_scheduler import background_priority
+
+DB_PATH = Path(__file__).parent.parent / "jobs.db"
+JOB_RETENTION_HOURS = int(os.getenv("JOB_RETENTION_HOURS", "24"))
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "15"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+# Identifies this worker process for this boot
+WORKER_ID = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Keeps running jobs referenced (and cancellable) in this worker
+_job_tasks: dict[str, asyncio.Task] = {}
+_heartbeat_task: Optional[asyncio.Task] = None
+
+
+async def _fail_expired_jobs(db):
+    """Fail live jobs whose owner stopped heartbeating (crashed or restarted)."""
+    now = datetime.utcnow()
+    expired = (now - timedelta(seconds=JOB_LEASE_SECONDS)).isoformat()
+    await db.execute(
+        """UPDATE collab_jobs SET status = 'failed', error = 'Interrupted by restart', updated_at = ?
+           WHERE status IN ('queued', 'running') AND updated_at < ?""",
+        (now.isoformat(), expired),
+    )
+
+
+async def _heartbeat():
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+        try:
+            async with aiosqlite.connect(str(DB_PATH)) as db:
+                await db.execute(
+                    """UPDATE collab_jobs SET updated_at = ?
+                       WHERE owner = ? AND status IN ('queued', 'running')""",
+                    (datetime.utcnow().isoformat(), WORKER_ID),
+                )
+                await _fail_expired_jobs(db)
+                await db.commit()
+        except Exception as e:
+            print(f"⚠️  Job heartbeat failed: {e}")
+
+
+async def init_job_store():
+    """Create the jobs table, expire old jobs, fail ones orphaned by dead workers."""
+    global _heartbeat_task
+    cutoff = (datetime.utcnow() - timedelta(hours=JOB_RETENTION_HOURS)).isoformat()
+    async with aiosqlite.connect(str(DB_PATH)) as db:
+        await db.execute("PRAGMA journal_mode = WAL")
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS collab_jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                request TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                owner TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        async with db.execute("PRAGMA table_info(collab_jobs)") as cursor:
+            columns = {row[1] for row in await cursor.fetchall()}
+        if "owner" not in columns:
+            await db.execute("ALTER TABLE collab_jobs ADD COLUMN owner TEXT")
+        await db.execute("DELETE FROM collab_jobs WHERE updated_at < ?", (cutoff,))
+        await _fail_expired_jobs(db)
+        await db.commit()
+    if _heartbeat_task is None:
+        _heartbeat_task = asyncio.create_task(_heartbeat())
+    print(f"✅ Job store initialized at {DB_PATH} (worker {WORKER_ID})")
+
+
+async def close_job_store():
+    """Stop heartbeating and cancel jobs still running in this worker."""
+    global _heartbeat_task
+    if _heartbeat_task is not None:
+        _heartbeat_task.cancel()
+        _heartbeat_task = None
+    tasks = list(_job_tasks.values())
+    for task in tasks:
+        task.cancel()
+    # Let each job record its cancellation before the loop goes away
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _job_tasks.clear()
+
+
+async def _update_job(job_id: str, status: str, result: Optional[dict] = None, error: Optional[str] = None):
+    async with aiosqlite.connect(str(DB_PATH)) as db:
+        await db.execute(
+            "UPDATE collab_jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+            (
+                status,
+                json.dumps(result) if result is not None else None,
+                error,
+                datetime.utcnow().isoformat(),
+                job_id,
+            ),
+        )
+        await db.commit()
+
+
+async def _run_job(job_id: str, request: dict):
+    try:
+        await _update_job(job_id, "running")
+        with background_priority():
+            result = await orchestrate_collaboration(
+                query=request["query"],
+                num_agents=request.get("num_agents"),
+                conversation_history=request.get("conversation_history"),
+                mode=request.get("mode"),
+                wave_sizes=request.get("wave_sizes"),
+                depends_on=request.get("depends_on"),
+                prompt_layout=request.get("prompt_layout", "persona_first"),
+                quorum=request.get("quorum"),
+                quorum_deadline_ms=request.get("quorum_deadline_ms"),
+                late_responses=request.get("late_responses", "drop"),
+                synthesis_fan_in=request.get("synthesis_fan_in"),
+                use_cache=request.get("use_cache", True),
+            )
+        await _update_job(job_id, "completed", result=result)
+    except asyncio.CancelledError:
+        await _update_job(job_id, "cancelled")
+        raise
+    except Exception as e:
+        await _update_job(job_id, "failed", error=str(e))
+    finally:
+        _job_tasks.pop(job_id, None)
+
+
+async def submit_collaboration_job(request: dict) -> dict:
+    """Persist a collaboration request and start it in the background."""
+    job_id = uuid.uuid4().hex
+    now = datetime.utcnow().isoformat()
+    async with aiosqlite.connect(str(DB_PATH)) as db:
+        await db.execute(
+            """INSERT INTO collab_jobs (id, status, request, owner, created_at, updated_at)
+               VALUES (?, 'queued', ?, ?, ?, ?)""",
+            (job_id, json.dumps(request), WORKER_ID, now, now),
+        )
+        await db.commit()
+
+    _job_tasks[job_id] = asyncio.create_task(_run_job(job_id, request))
+    return {"job_id": job_id, "status": "queued", "created_at": now}
+
+
+async def get_job(job_id: str) -> Optional[dict]:
+    """Get a job's status, and its result once completed."""
+    async with aiosqlite.connect(str(DB_PATH)) as db:
+        db.row_factory = aiosqlite.Row
+        cursor = await db.execute("SELECT * FROM collab_jobs WHERE id = ?", (job_id,))
+        row = await cursor.fetchone()
+        if not row:
+            return None
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "request": json.loads(row["request"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "owner": row["owner"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+
+async def cancel_job(job_id: str) -> dict:
+    """Cancel a job running in this worker; otherwise say why it can't be."""
+    task = _job_tasks.get(job_id)
+    if task is not None:
+        task.cancel()
+        return {"job_id": job_id, "cancelled": True}
+
+    job = await get_job(job_id)
+    if job is None:
+        return {"job_id": job_id, "cancelled": False, "reason": "not_found"}
+    if job["status"] not in ("queued", "running"):
+        return {"job_id": job_id, "cancelled": False, "reason": f"already {job['status']}"}
+    return {
+        "job_id": job_id,
+        "cancelled": False,
+        "reason": "not owned by this worker",
+        "owner": job["owner"],
+        "worker": WORKER_ID,
+    }
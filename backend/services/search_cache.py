@@ -0,0 +1,149 @@
+"""
+Search Cache — Persistent SQLite tier for web search results
+Keeps warm Exa / xAI / Firecrawl results across worker restarts and shares
+them between all uvicorn workers on the host.
+
+Disabled unless SEARCH_DISK_CACHE=true. Other settings:
+- SEARCH_DISK_CACHE_PATH (default backend/search_cache.db)
+- SEARCH_DISK_CACHE_MAX_ROWS size cap (default 50000)
+- SEARCH_DISK_CACHE_VACUUM_INTERVAL seconds between cleanups (default 600)
+"""
+
+import os
+import json
+import time
+import asyncio
+import aiosqlite
+from pathlib import Path
+from typing import Optional
+
+DISK_CACHE_ENABLED = os.getenv("SEARCH_DISK_CACHE", "false").lower() in ("1", "true", "yes")
+DISK_CACHE_PATH = Path(os.getenv(
+    "SEARCH_DISK_CACHE_PATH", str(Path(__file__).parent.parent / "search_cache.db")
+))
+DISK_CACHE_MAX_ROWS = int(os.getenv("SEARCH_DISK_CACHE_MAX_ROWS", "50000"))
+DISK_CACHE_VACUUM_INTERVAL = float(os.getenv("SEARCH_DISK_CACHE_VACUUM_INTERVAL", "600"))
+
+_db: Optional[aiosqlite.Connection] = None
+_maintenance_task: Optional[asyncio.Task] = None
+
+
+def _cache_key(source: str, key: tuple) -> str:
+    return json.dumps([source, *key], ensure_ascii=False)
+
+
+async def init_search_cache():
+    """Open the shared cache database and start background cleanup."""
+    global _db, _maintenance_task
+    if not DISK_CACHE_ENABLED or _db is not None:
+        return
+
+    _db = await aiosqlite.connect(str(DISK_CACHE_PATH))
+    # auto_vacuum only takes effect before the first table is created
+    await _db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    await _db.execute("PRAGMA journal_mode = WAL")
+    await _db.execute("PRAGMA synchronous = NORMAL")
+    await _db.execute("PRAGMA busy_timeout = 5000")
+    await _db.execute("""
+        CREATE TABLE IF NOT EXISTS search_cache (
+            key TEXT PRIMARY KEY,
+            source TEXT NOT NULL,
+            results TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    """)
+    await _db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_search_cache_expires ON search_cache(expires_at)
+    """)
+    await _db.commit()
+
+    _maintenance_task = asyncio.create_task(_maintenance_loop())
+    print(f"✅ Search disk cache at {DISK_CACHE_PATH}")
+
+
+async def close_search_cache():
+    """Stop background cleanup and close the database."""
+    global _db, _maintenance_task
+    if _maintenance_task is not None:
+        _maintenance_task.cancel()
+        _maintenance_task = None
+    if _db is not None:
+        await _db.close()
+        _db = None
+
+
+async def get_cached_results(source: str, key: tuple) -> Optional[tuple[list[dict], float]]:
+    """Return (results, seconds until expiry) for a live entry, else None."""
+    if _db is None:
+        return None
+    try:
+        cursor = await _db.execute(
+            "SELECT results, expires_at FROM search_cache WHERE key = ? AND expires_at > ?",
+            (_cache_key(source, key), time.time()),
+        )
+        row = await cursor.fetchone()
+    except Exception as e:
+        print(f"Search disk cache read error: {e}")
+        return None
+    if not row:
+        return None
+    return json.loads(row[0]), row[1] - time.time()
+
+
+async def store_results(source: str, key: tuple, results: list[dict], ttl: float):
+    """Write results through to disk with an absolute expiry."""
+    if _db is None:
+        return
+    try:
+        await _db.execute(
+            """INSERT OR REPLACE INTO search_cache (key, source, results, expires_at)
+               VALUES (?, ?, ?, ?)""",
+            (_cache_key(source, key), source, json.dumps(results), time.time() + ttl),
+        )
+        await _db.commit()
+    except Exception as e:
+        print(f"Search disk cache write error: {e}")
+
+
+async def purge_expired() -> int:
+    """Drop expired rows, trim to the size cap, and give pages back to the OS."""
+    if _db is None:
+        return 0
+    cursor = await _db.execute("DELETE FROM search_cache WHERE expires_at <= ?", (time.time(),))
+    removed = cursor.rowcount
+    # Over the cap: evict entries closest to expiry first
+    cursor = await _db.execute(
+        """DELETE FROM search_cache WHERE key IN (
+               SELECT key FROM search_cache ORDER BY expires_at ASC
+               LIMIT max((SELECT count(*) FROM search_cache) - ?, 0)
+           )""",
+        (DISK_CACHE_MAX_ROWS,),
+    )
+    removed += cursor.rowcount
+    await _db.commit()
+    await _db.execute("PRAGMA incremental_vacuum")
+    return removed
+
+
+async def _maintenance_loop():
+    while True:
+        await asyncio.sleep(DISK_CACHE_VACUUM_INTERVAL)
+        try:
+            removed = await purge_expired()
+            if removed:
+                print(f"🧹 Search disk cache purged {removed} entries")
+        except Exception as e:
+            print(f"Search disk cache maintenance error: {e}")
+
+
+async def get_search_disk_cache_stats() -> dict:
+    if _db is None:
+        return {"enabled": False}
+    cursor = await _db.execute("SELECT count(*) FROM search_cache")
+    (rows,) = await cursor.fetchone()
+    return {
+        "enabled": True,
+        "path": str(DISK_CACHE_PATH),
+        "rows": rows,
+        "max_rows": DISK_CACHE_MAX_ROWS,
+    }
@@ -0,0 +1,117 @@
+"""
+Search Dedup — URL canonicalization and near-duplicate detection
+Collapses the same page reached through different URLs (scheme, www.,
+trailing slash, fragments, tracking params) and mirrored pages whose
+highlights are near-identical (64-bit SimHash over word shingles).
+"""
+
+import re
+import hashlib
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import numpy as np
+
+# Click-tracking only; params like `ref` can select content (GitHub ?ref=branch)
+TRACKING_PARAMS = {
+    "gclid", "fbclid", "msclkid", "dclid", "igshid", "mc_cid", "mc_eid",
+    "ref_src", "ref_url", "_hsenc", "_hsmi", "yclid",
+}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Fingerprints within this many differing bits are treated as the same content
+SIMHASH_MAX_DISTANCE = 3
+# Short snippets collide too easily to fingerprint safely
+SIMHASH_MIN_TOKENS = 12
+SHINGLE_SIZE = 3
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a URL so trivially different links to one page compare equal."""
+    url = (url or "").strip()
+    if not url:
+        return ""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        return url.lower()
+
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{parts.port}"
+
+    path = re.sub(r"/{2,}", "/", parts.path)
+    if path.endswith("/"):
+        path = path.rstrip("/")
+
+    params = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ]
+    query = urlencode(sorted(params))
+
+    # http and https variants of a page are the same result
+    return urlunsplit(("https", host, path, query, ""))
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash of `text`, or None when it's too short to be meaningful."""
+    tokens = _TOKEN_RE.findall((text or "").lower())
+    if len(tokens) < SIMHASH_MIN_TOKENS:
+        return None
+
+    shingles = {
+        " ".join(tokens[i:i + SHINGLE_SIZE])
+        for i in range(len(tokens) - SHINGLE_SIZE + 1)
+    }
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little") for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    # One row of 64 bits per shingle; each bit position votes +1/-1
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)
+    return int.from_bytes(np.packbits(votes > 0, bitorder="little").tobytes(), "little")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class DedupeIndex:
+    """Assigns search results to clusters of identical or near-identical pages."""
+
+    def __init__(self, max_distance: int = SIMHASH_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self._by_url: dict[str, int] = {}
+        self._fingerprints: list[tuple[int, int]] = []
+        self._next_id = 0
+
+    def assign(self, result: dict) -> tuple[int, bool]:
+        """Return (cluster id, is_new) for a result, registering it if new."""
+        url = canonicalize_url(result.get("url", ""))
+        if url and url in self._by_url:
+            return self._by_url[url], False
+
+        fingerprint = simhash(" ".join(result.get("highlights") or []))
+        cluster_id = None
+        if fingerprint is not None:
+            for seen, seen_id in self._fingerprints:
+                if hamming_distance(fingerprint, seen) <= self.max_distance:
+                    cluster_id = seen_id
+                    break
+
+        is_new = cluster_id is None
+        if is_new:
+            cluster_id = self._next_id
+            self._next_id += 1
+            if fingerprint is not None:
+                self._fingerprints.append((fingerprint, cluster_id))
+        if url:
+            self._by_url[url] = cluster_id
+        return cluster_id, is_new
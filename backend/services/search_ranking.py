@@ -0,0 +1,115 @@
+"""
+Search Ranking — Fusion of per-provider result lists
+Clusters duplicate pages across providers (see search_dedup) and ranks the
+clusters in one vectorized numpy pass:
+- rrf: reciprocal rank fusion, sum of weight / (k + rank)
+- weighted: sum of weight * provider score normalized to 0-1
+Only the top_k winning clusters are turned back into result dicts.
+"""
+
+import os
+from typing import Optional
+
+import numpy as np
+
+from services.search_dedup import DedupeIndex
+
+FUSION_MODES = ("rrf", "weighted")
+RRF_K = int(os.getenv("SEARCH_RRF_K", "60"))
+
+DEFAULT_SOURCE_WEIGHTS = {
+    "exa": 1.0,
+    "firecrawl": 1.0,
+    "xai": 1.0,
+}
+
+
+def _weighted_contributions(
+    source_idx: np.ndarray,
+    ranks: np.ndarray,
+    raw_scores: np.ndarray,
+    list_sizes: np.ndarray,
+) -> np.ndarray:
+    """Per-row 0-1 score: score / provider max, or rank-based when a provider has no scores."""
+    source_max = np.zeros(len(list_sizes))
+    np.maximum.at(source_max, source_idx, raw_scores)
+    row_max = source_max[source_idx]
+    by_score = np.divide(raw_scores, row_max, out=np.zeros_like(raw_scores), where=row_max > 0)
+    by_rank = 1.0 - ranks / list_sizes[source_idx]
+    return np.where(row_max > 0, by_score, by_rank)
+
+
+def fuse_results(
+    by_source: dict[str, list[dict]],
+    mode: str = "rrf",
+    weights: Optional[dict[str, float]] = None,
+    top_k: Optional[int] = None,
+) -> list[dict]:
+    """
+    Merge provider result lists into one ranked list.
+    Provider order in `by_source` breaks score ties. Each result carries
+    `merged_score` and the `sources` that returned it.
+    """
+    if mode not in FUSION_MODES:
+        raise ValueError(f"Unknown fusion mode: {mode}")
+    weights = {**DEFAULT_SOURCE_WEIGHTS, **(weights or {})}
+
+    sources = list(by_source)
+    index = DedupeIndex()
+    rows: list[dict] = []
+    cluster_ids, source_idx, ranks, raw_scores = [], [], [], []
+    for s_i, source in enumerate(sources):
+        valid = [r for r in by_source[source] if isinstance(r, dict) and "error" not in r]
+        for rank, result in enumerate(valid):
+            cluster_id, _ = index.assign(result)
+            rows.append(result)
+            cluster_ids.append(cluster_id)
+            source_idx.append(s_i)
+            ranks.append(rank)
+            raw_scores.append(float(result.get("score") or 0))
+    if not rows:
+        return []
+
+    cluster_ids = np.asarray(cluster_ids, dtype=np.int64)
+    source_idx = np.asarray(source_idx, dtype=np.int64)
+    ranks = np.asarray(ranks, dtype=np.float64)
+    raw_scores = np.asarray(raw_scores, dtype=np.float64)
+    source_weights = np.asarray([weights.get(s, 1.0) for s in sources], dtype=np.float64)
+
+    if mode == "rrf":
+        contrib = 1.0 / (RRF_K + ranks + 1.0)
+    else:
+        list_sizes = np.bincount(source_idx, minlength=len(sources)).astype(np.float64)
+        contrib = _weighted_contributions(source_idx, ranks, raw_scores, list_sizes)
+    contrib *= source_weights[source_idx]
+
+    n_clusters = int(cluster_ids.max()) + 1
+    fused = np.bincount(cluster_ids, weights=contrib, minlength=n_clusters)
+
+    # Top-k clusters without a full sort; ties go to the earliest cluster
+    k = n_clusters if top_k is None else max(0, min(top_k, n_clusters))
+    if k == 0:
+        return []
+    candidates = np.arange(n_clusters)
+    if k < n_clusters:
+        candidates = np.argpartition(-fused, k - 1)[:k]
+    winners = candidates[np.lexsort((candidates, -fused[candidates]))]
+
+    # Representative row per cluster: its strongest contribution
+    order = np.lexsort((-contrib, cluster_ids))
+    first_rows = order[np.r_[True, cluster_ids[order][1:] != cluster_ids[order][:-1]]]
+    representative = dict(zip(cluster_ids[first_rows].tolist(), first_rows.tolist()))
+
+    members: dict[int, list[str]] = {int(c): [] for c in winners}
+    for row, cluster_id in enumerate(cluster_ids.tolist()):
+        if cluster_id in members and sources[source_idx[row]] not in members[cluster_id]:
+            members[cluster_id].append(sources[source_idx[row]])
+
+    return [
+        {
+            **rows[representative[int(c)]],
+            "sources": members[int(c)],
+            "merged_score": round(float(fused[c]), 6),
+        }
+        for c in winners
+    ]
@@ -2,14 +2,85 @@
 Search Service — Dual Web Search (xAI + Exa)
 Provides web search via xAI SDK (Grok + web_search tool) and Exa API.
 Supports combined parallel search with result deduplication.
+Combined search results are cached per source (TTL + LRU, optionally backed
+by a shared SQLite tier) and concurrent identical queries are coalesced onto
+one upstream call.
 """
 
 import os
 import asyncio
-import httpx
 from typing import Optional
 from datetime import datetime
 
+from services.cache import TTLCache, SingleFlight
+from services import search_cache
+from services.search_dedup import DedupeIndex
+from services.search_ranking import fuse_results
+from services.xai_scheduler import xai_scheduler
+from services.http_client import (
+    get_http_client,
+    EXA_BASE_URL,
+    FIRECRAWL_BASE_URL,
+)
+
+
+# ─── Result Cache ─────────────────────────────────────────────────────────────
+
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024"))
+
+# xAI answers are generated from live search, so they go stale fastest
+SEARCH_CACHE_TTLS = {
+    "xai": float(os.getenv("SEARCH_CACHE_TTL_XAI", "300")),
+    "exa": float(os.getenv("SEARCH_CACHE_TTL_EXA", "900")),
+    "firecrawl": float(os.getenv("SEARCH_CACHE_TTL_FIRECRAWL", "900")),
+}
+
+_search_caches = {
+    source: TTLCache(max_entries=SEARCH_CACHE_MAX_ENTRIES, ttl=ttl)
+    for source, ttl in SEARCH_CACHE_TTLS.items()
+}
+_search_flights = {source: SingleFlight() for source in SEARCH_CACHE_TTLS}
+
+
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+async def _cached_search(source: str, key: tuple, fetch) -> list[dict]:
+    """
+    Serve a source's results from memory, then the disk tier, or fetch them
+    once for all concurrent callers. Error results are never cached.
+    """
+    cache = _search_caches[source]
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    async def fetch_and_store() -> list[dict]:
+        on_disk = await search_cache.get_cached_results(source, key)
+        if on_disk is not None:
+            results, remaining_ttl = on_disk
+            cache.set(key, results, ttl=remaining_ttl)
+            return results
+
+        results = await fetch()
+        if not any("error" in r for r in results):
+            cache.set(key, results)
+            await search_cache.store_results(source, key, results, cache.ttl)
+        return results
+
+    return await _search_flights[source].do(key, fetch_and_store)
+
+
+async def get_search_cache_stats() -> dict:
+    """Hit/miss counters and sizes for each source's result cache."""
+    stats = {
+        source: {**cache.stats(), "coalesced": _search_flights[source].coalesced}
+        for source, cache in _search_caches.items()
+    }
+    stats["disk"] = await search_cache.get_search_disk_cache_stats()
+    return stats
+
 
 # ─── Exa Search ────────────────────────────────────────────────────────────────
 
@@ -36,33 +107,34 @@ async def search_exa(
     if category:
         payload["category"] = category
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            resp = await client.post(
-                "https://api.exa.ai/search",
-                headers={
-                    "x-api-key": api_key,
-                    "Content-Type": "application/json",
-                },
-                json=payload,
-            )
-            resp.raise_for_status()
-            data = resp.json()
-
-            results = []
-            for r in data.get("results", []):
-                results.append({
-                    "title": r.get("title", ""),
-                    "url": r.get("url", ""),
-                    "highlights": r.get("highlights", []),
-                    "score": r.get("score", 0),
-                    "published_date": r.get("publishedDate"),
-                    "source": "exa",
-                })
-            return results
-        except Exception as e:
-            print(f"Exa search error: {e}")
-            return [{"error": str(e), "source": "exa"}]
+    client = get_http_client(EXA_BASE_URL)
+    try:
+        resp = await client.post(
+            "/search",
+            timeout=30.0,
+            headers={
+                "x-api-key": api_key,
+                "Content-Type": "application/json",
+            },
+            json=payload,
+        )
+        resp.raise_for_status()
+        data = resp.json()
+
+        results = []
+        for r in data.get("results", []):
+            results.append({
+                "title": r.get("title", ""),
+                "url": r.get("url", ""),
+                "highlights": r.get("highlights", []),
+                "score": r.get("score", 0),
+                "published_date": r.get("publishedDate"),
+                "source": "exa",
+            })
+        return results
+    except Exception as e:
+        print(f"Exa search error: {e}")
+        return [{"error": str(e), "source": "exa"}]
 
 
 # ─── xAI Web Search ───────────────────────────────────────────────────────────
@@ -77,82 +149,82 @@ async def search_xai(query: str, num_results: int = 10) -> list[dict]:
         return [{"error": "XAI_API_KEY not configured"}]
 
     # Use xAI's OpenAI-compatible endpoint with web search tool
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        try:
-            resp = await client.post(
-                "https://api.x.ai/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": "grok-3-mini",
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": (
-                                "You are a web search assistant. Search the web for the query and return "
-                                "structured results. For each result provide: title, url, and a brief summary. "
-                                "Format as JSON array."
-                            ),
-                        },
-                        {"role": "user", "content": f"Search the web for: {query}"},
-                    ],
-                    "tools": [
-                        {
-                            "type": "function",
-                            "function": {
-                                "name": "web_search",
-                                "description": "Search the web for current information",
-                                "parameters": {
-                                    "type": "object",
-                                    "properties": {
-                                        "query": {
-                                            "type": "string",
-                                            "description": "Search query",
-                                        }
-                                    },
-                                    "required": ["query"],
+    try:
+        resp = await xai_scheduler.post(
+            "/v1/chat/completions",
+            timeout=60.0,
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "model": "grok-3-mini",
+                "messages": [
+                    {
+                        "role": "system",
+                        "content": (
+                            "You are a web search assistant. Search the web for the query and return "
+                            "structured results. For each result provide: title, url, and a brief summary. "
+                            "Format as JSON array."
+                        ),
+                    },
+                    {"role": "user", "content": f"Search the web for: {query}"},
+                ],
+                "tools": [
+                    {
+                        "type": "function",
+                        "function": {
+                            "name": "web_search",
+                            "description": "Search the web for current information",
+                            "parameters": {
+                                "type": "object",
+                                "properties": {
+                                    "query": {
+                                        "type": "string",
+                                        "description": "Search query",
+                                    }
                                 },
+                                "required": ["query"],
                             },
-                        }
-                    ],
-                    "tool_choice": "auto",
-                    "search_parameters": {
-                        "max_search_results": num_results,
-                    },
+                        },
+                    }
+                ],
+                "tool_choice": "auto",
+                "search_parameters": {
+                    "max_search_results": num_results,
                 },
-            )
-            resp.raise_for_status()
-            data = resp.json()
-
-            results = []
-            # Extract citations from the response
-            citations = data.get("citations", [])
-            for citation in citations:
-                results.append({
-                    "title": citation.get("title", ""),
-                    "url": citation.get("url", ""),
-                    "highlights": [citation.get("snippet", "")],
-                    "source": "xai",
-                })
-
-            # Also extract from message content if structured
-            choices = data.get("choices", [])
-            if choices and not results:
-                content = choices[0].get("message", {}).get("content", "")
-                results.append({
-                    "title": "xAI Search Result",
-                    "url": "",
-                    "highlights": [content[:500]],
-                    "source": "xai",
-                    "raw_content": content,
-                })
-
-            return results
-        except Exception as e:
-            print(f"xAI search error: {e}")
-            return [{"error": str(e), "source": "xai"}]
+            },
+        )
+        resp.raise_for_status()
+        data = resp.json()
+
+        results = []
+        # Extract citations from the response
+        citations = data.get("citations", [])
+        for citation in citations:
+            results.append({
+                "title": citation.get("title", ""),
+                "url": citation.get("url", ""),
+                "highlights": [citation.get("snippet", "")],
+                "source": "xai",
+            })
+
+        # Also extract from message content if structured
+        choices = data.get("choices", [])
+        if choices and not results:
+            content = choices[0].get("message", {}).get("content", "")
+            results.append({
+                "title": "xAI Search Result",
+                "url": "",
+                "highlights": [content[:500]],
+                "source": "xai",
+                "raw_content": content,
+            })
+
+        return results
+    except Exception as e:
+        print(f"xAI search error: {e}")
+        return [{"error": str(e), "source": "xai"}]
 
 
 # ─── Firecrawl Search ────────────────────────────────────────────────────────
@@ -163,92 +235,174 @@ async def search_firecrawl(query: str, num_results: int = 5) -> list[dict]:
     if not api_key:
         return [{"error": "FIRECRAWL_API_KEY not configured", "source": "firecrawl"}]
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            # Firecrawl /search endpoint
-            resp = await client.post(
-                "https://api.firecrawl.dev/v0/search",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "query": query,
-                    "limit": num_results,
-                    "scrapeOptions": {"formats": ["markdown"]} # Optional: get content too
-                },
-            )
-            # Handle non-200 safely
-            if resp.status_code != 200:
-                 return [{"error": f"Firecrawl error: {resp.status_code}", "source": "firecrawl"}]
-
-            data = resp.json()
-            # Firecrawl response structure check needed, usually data['data'] or similar
-            # Assuming standard structure based on docs: { success: true, data: [...] }
-            results = []
-            
-            # Accommodate potential response variations
-            items = data.get("data", []) if isinstance(data.get("data"), list) else []
-
-            for r in items:
-                results.append({
-                    "title": r.get("metadata", {}).get("title") or r.get("title", "No title"),
-                    "url": r.get("url", ""),
-                    "highlights": [r.get("markdown", "")[:300]] if r.get("markdown") else [],
-                    "score": 0, # Firecrawl might not return score
-                    "source": "firecrawl",
-                })
-            return results
-        except Exception as e:
-            print(f"Firecrawl search error: {e}")
-            return [{"error": str(e), "source": "firecrawl"}]
+    client = get_http_client(FIRECRAWL_BASE_URL)
+    try:
+        # Firecrawl /search endpoint
+        resp = await client.post(
+            "/v0/search",
+            timeout=30.0,
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "query": query,
+                "limit": num_results,
+                "scrapeOptions": {"formats": ["markdown"]} # Optional: get content too
+            },
+        )
+        # Handle non-200 safely
+        if resp.status_code != 200:
+             return [{"error": f"Firecrawl error: {resp.status_code}", "source": "firecrawl"}]
+
+        data = resp.json()
+        # Firecrawl response structure check needed, usually data['data'] or similar
+        # Assuming standard structure based on docs: { success: true, data: [...] }
+        results = []
+        
+        # Accommodate potential response variations
+        items = data.get("data", []) if isinstance(data.get("data"), list) else []
+
+        for r in items:
+            results.append({
+                "title": r.get("metadata", {}).get("title") or r.get("title", "No title"),
+                "url": r.get("url", ""),
+                "highlights": [r.get("markdown", "")[:300]] if r.get("markdown") else [],
+                "score": 0, # Firecrawl might not return score
+                "source": "firecrawl",
+            })
+        return results
+    except Exception as e:
+        print(f"Firecrawl search error: {e}")
+        return [{"error": str(e), "source": "firecrawl"}]
 
 
 # ─── Combined Search ──────────────────────────────────────────────────────────
 
+def _dedupe_results(results: list[dict], index: DedupeIndex) -> list[dict]:
+    """Drop errors and results already seen by `index` (by canonical URL or near-duplicate content)."""
+    unique = []
+    for result in results:
+        if not isinstance(result, dict) or "error" in result:
+            continue
+        _, is_new = index.assign(result)
+        if is_new:
+            unique.append(result)
+    return unique
+
+
+def _start_source_tasks(
+    query: str,
+    num_results: int,
+    category: Optional[str],
+) -> dict[str, asyncio.Task]:
+    """Kick off every search source in parallel, each through the result cache."""
+    norm_query = _normalize_query(query)
+    norm_category = category.lower() if category else None
+
+    return {
+        "xai": asyncio.create_task(_cached_search(
+            "xai", (norm_query, num_results),
+            lambda: search_xai(query, num_results),
+        )),
+        "exa": asyncio.create_task(_cached_search(
+            "exa", (norm_query, num_results, norm_category),
+            lambda: search_exa(query, num_results, category),
+        )),
+        "firecrawl": asyncio.create_task(_cached_search(
+            "firecrawl", (norm_query, num_results),
+            lambda: search_firecrawl(query, num_results),
+        )),
+    }
+
+
+async def _await_sources(
+    tasks: dict[str, asyncio.Task],
+    deadline_ms: Optional[int] = None,
+    min_results: Optional[int] = None,
+) -> dict[str, list[dict]]:
+    """
+    Wait for source tasks until all finish, the deadline passes, or at least
+    `min_results` results are in. Unfinished sources are cancelled and
+    reported as error entries with `timed_out` set.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = None if deadline_ms is None else loop.time() + deadline_ms / 1000
+    pending = set(tasks.values())
+    hit_deadline = False
+
+    while pending:
+        timeout = None if deadline is None else max(0.0, deadline - loop.time())
+        done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            hit_deadline = True
+            break
+        if min_results:
+            found = sum(
+                len([r for r in t.result() if "error" not in r])
+                for t in tasks.values()
+                if t.done() and not t.cancelled() and t.exception() is None
+            )
+            if found >= min_results:
+                break
+
+    # Cancelling only drops our wait — a coalesced upstream call still
+    # finishes in the background and warms the cache for the next query.
+    for task in pending:
+        task.cancel()
+
+    results = {}
+    for source, task in tasks.items():
+        if task in pending:
+            reason = f"Timed out after {deadline_ms}ms" if hit_deadline else "Skipped: min_results reached"
+            results[source] = [{"error": reason, "source": source, "timed_out": hit_deadline}]
+        elif task.exception() is not None:
+            results[source] = []
+        else:
+            results[source] = task.result()
+    return results
+
+
 async def search_combined(
     query: str,
     num_results: int = 10,
     category: Optional[str] = None,
+    deadline_ms: Optional[int] = None,
+    min_results: Optional[int] = None,
+    ranking: str = "rrf",
+    source_weights: Optional[dict[str, float]] = None,
+    top_k: Optional[int] = None,
 ) -> dict:
     """
     Run xAI, Exa, and Firecrawl searches in parallel, merge and deduplicate.
+    Each source is served from the result cache when warm.
+
+    With `deadline_ms`, returns whatever sources finished within the budget;
+    with `min_results`, returns as soon as that many results are in.
+    Sources that didn't make it show up in `errors`.
+
+    Results are fused with `ranking` ("rrf" or "weighted") using optional
+    per-source weights, keeping the best `top_k` (default num_results * 2).
     """
-    xai_task = asyncio.create_task(search_xai(query, num_results))
-    exa_task = asyncio.create_task(search_exa(query, num_results, category))
-    fc_task = asyncio.create_task(search_firecrawl(query, num_results))
-
-    # Wait for all
-    results_list = await asyncio.gather(xai_task, exa_task, fc_task, return_exceptions=True)
-    
-    # Unpack safely
-    xai_results = results_list[0] if isinstance(results_list[0], list) else []
-    exa_results = results_list[1] if isinstance(results_list[1], list) else []
-    fc_results = results_list[2] if isinstance(results_list[2], list) else []
-
-    # Flatten and filter errors
-    all_raw = []
-    for source_res in [xai_results, exa_results, fc_results]:
-        if isinstance(source_res, list):
-            all_raw.extend([r for r in source_res if "error" not in r])
-
-    # Deduplicate by URL
-    seen_urls = set()
-    merged = []
-    # Priority: Exa > Firecrawl > xAI
-    for result in exa_results + fc_results + xai_results:
-        if not isinstance(result, dict) or "error" in result: continue
-        
-        url = result.get("url", "")
-        if url and url in seen_urls:
-            continue
-        if url:
-            seen_urls.add(url)
-        merged.append(result)
+    tasks = _start_source_tasks(query, num_results, category)
+    by_source = await _await_sources(tasks, deadline_ms, min_results)
+
+    xai_results = by_source["xai"]
+    exa_results = by_source["exa"]
+    fc_results = by_source["firecrawl"]
+
+    # Deduplicate by canonical URL / near-duplicate content, rank by fused score
+    # (Exa > Firecrawl > xAI only breaks ties)
+    merged = fuse_results(
+        {"exa": exa_results, "firecrawl": fc_results, "xai": xai_results},
+        mode=ranking,
+        weights=source_weights,
+        top_k=top_k if top_k is not None else num_results * 2,  # Allow more results from combined
+    )
 
     return {
         "query": query,
-        "results": merged[:num_results * 2],  # Allow more results from combined
+        "results": merged,
         "sources": {
             "xai": len([r for r in xai_results if "error" not in r]),
             "exa": len([r for r in exa_results if "error" not in r]),
@@ -259,6 +413,66 @@ async def search_combined(
     }
 
 
+async def stream_search_combined(
+    query: str,
+    num_results: int = 10,
+    category: Optional[str] = None,
+    deadline_ms: Optional[int] = None,
+):
+    """
+    Streaming counterpart of search_combined. Yields event dicts:
+    - results: one provider's new (not yet sent, not near-duplicate) results, as soon as it returns
+    - summary: per-source counts and errors once every source is settled
+    """
+    tasks = _start_source_tasks(query, num_results, category)
+    source_of = {task: source for source, task in tasks.items()}
+    loop = asyncio.get_running_loop()
+    deadline = None if deadline_ms is None else loop.time() + deadline_ms / 1000
+
+    index = DedupeIndex()
+    sent = 0
+    limit = num_results * 2
+    counts = {source: 0 for source in tasks}
+    errors = []
+    pending = set(tasks.values())
+
+    try:
+        while pending:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                for task in pending:
+                    errors.append({
+                        "error": f"Timed out after {deadline_ms}ms",
+                        "source": source_of[task],
+                        "timed_out": True,
+                    })
+                break
+
+            for task in done:
+                source = source_of[task]
+                results = task.result() if task.exception() is None else []
+                source_errors = [r for r in results if isinstance(r, dict) and "error" in r]
+                errors.extend(source_errors)
+                counts[source] = len(results) - len(source_errors)
+
+                new = _dedupe_results(results, index)[:max(0, limit - sent)]
+                sent += len(new)
+                yield {"type": "results", "source": source, "results": new, "errors": source_errors}
+    finally:
+        for task in pending:
+            task.cancel()
+
+    yield {
+        "type": "summary",
+        "query": query,
+        "count": sent,
+        "sources": counts,
+        "errors": errors,
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
+
 def format_search_for_context(results: list[dict]) -> str:
     """Format search results into a context string for injection into AI prompts."""
     if not results:
@@ -0,0 +1,91 @@
+"""
+SQLite Migrations — Versioned schema changes tracked in PRAGMA user_version
+Each database owns an ordered list of Migration(version, name, statements).
+migrate() applies the ones above the file's user_version, each in its own
+BEGIN IMMEDIATE transaction that also bumps user_version, so a crash or a
+failing statement leaves the schema at the last good version. Several
+workers starting at once are safe: the version is re-checked after the
+write lock is taken.
+
+Index builds should be their own migration via create_index(): SQLite
+holds the write lock while an index builds, so keeping each build in a
+short transaction (readers carry on under WAL) and using IF NOT EXISTS
+(a re-run is a no-op) keeps them safe on a live database.
+
+With dry_run=True nothing is written; the pending plan is returned and
+printed instead.
+"""
+
+from dataclasses import dataclass
+
+from services.sqlite_pool import SQLitePool
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    statements: tuple[str, ...]
+
+
+def create_index(name: str, table: str, columns: str, unique: bool = False) -> str:
+    """Idempotent CREATE INDEX statement for use in a migration."""
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    return f"CREATE {kind} IF NOT EXISTS {name} ON {table}({columns})"
+
+
+def _check_order(migrations: list[Migration]):
+    versions = [m.version for m in migrations]
+    if versions != sorted(set(versions)) or (versions and versions[0] < 1):
+        raise ValueError(f"Migration versions must be unique, ascending and >= 1: {versions}")
+
+
+async def _user_version(db) -> int:
+    async with db.execute("PRAGMA user_version") as cursor:
+        return (await cursor.fetchone())[0]
+
+
+async def migrate(pool: SQLitePool, migrations: list[Migration], dry_run: bool = False) -> dict:
+    """Apply pending migrations in order; returns what was (or would be) applied."""
+    _check_order(migrations)
+    label = pool.path.name
+
+    async with pool.read() as db:
+        current = await _user_version(db)
+    pending = [m for m in migrations if m.version > current]
+    latest = migrations[-1].version if migrations else 0
+    if current > latest:
+        print(f"⚠️  {label} is at schema v{current}, newer than this code knows (v{latest})")
+
+    plan = {
+        "database": label,
+        "from_version": current,
+        "to_version": current,
+        "pending": [{"version": m.version, "name": m.name, "statements": list(m.statements)} for m in pending],
+        "applied": [],
+        "dry_run": dry_run,
+    }
+    if dry_run:
+        for m in pending:
+            print(f"📝 [dry run] {label} v{m.version} {m.name}:")
+            for statement in m.statements:
+                print(f"     {' '.join(statement.split())}")
+        return plan
+
+    for m in pending:
+        async with pool.write() as db:
+            await db.execute("BEGIN IMMEDIATE")
+            # Another worker may have applied it while we waited for the lock
+            if await _user_version(db) >= m.version:
+                continue
+            for statement in m.statements:
+                await db.execute(statement)
+            await db.execute(f"PRAGMA user_version = {m.version}")
+        plan["applied"].append(m.version)
+        print(f"🗂️  {label}: applied migration v{m.version} {m.name}")
+
+    async with pool.write() as db:
+        if plan["applied"]:
+            await db.execute("PRAGMA optimize")
+        plan["to_version"] = await _user_version(db)
+    return plan
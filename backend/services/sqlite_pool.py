@@ -0,0 +1,146 @@
+"""
+SQLite Pool — Long-lived aiosqlite connections for a single database file
+Opening an aiosqlite connection spawns a thread and re-reads the schema,
+so hot paths borrow from a fixed set of connections instead:
+- one writer connection, serialized by a lock (SQLite allows one writer)
+- SQLITE_READERS read-only connections handed out from a queue
+- a read-only watcher connection that only polls PRAGMA data_version, so
+  cross-process change checks never queue behind a write or a reader
+
+Every connection runs in WAL mode with synchronous=NORMAL, memory-mapped
+I/O (mmap_size) and a per-connection prepared-statement cache, so readers
+never block on the writer and repeated queries skip re-parsing.
+"""
+
+import os
+import asyncio
+import sqlite3
+import aiosqlite
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional
+
+SQLITE_READERS = int(os.getenv("SQLITE_READERS", "4"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_STATEMENT_CACHE = int(os.getenv("SQLITE_STATEMENT_CACHE", "256"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+class SQLitePool:
+    """One writer and a fixed set of readers over the same database file."""
+
+    def __init__(self, path: Path, readers: int = SQLITE_READERS):
+        self.path = path
+        self.size = max(1, readers)
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+        self._readers: asyncio.Queue = asyncio.Queue()
+        self._all_readers: list[aiosqlite.Connection] = []
+        self._watcher: Optional[aiosqlite.Connection] = None
+        # data_version as of this pool's last commit (or the last external change seen)
+        self._seen_version: Optional[int] = None
+
+    async def _connect(self, read_only: bool) -> aiosqlite.Connection:
+        db = await aiosqlite.connect(str(self.path), cached_statements=SQLITE_STATEMENT_CACHE)
+        db.row_factory = aiosqlite.Row
+        await db.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        await db.execute("PRAGMA journal_mode = WAL")
+        await db.execute("PRAGMA synchronous = NORMAL")
+        await db.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        if read_only:
+            await db.execute("PRAGMA query_only = ON")
+        return db
+
+    async def open(self):
+        if self._writer is not None:
+            return
+        # Writer first, so WAL mode is set before any reader attaches
+        self._writer = await self._connect(read_only=False)
+        for _ in range(self.size):
+            db = await self._connect(read_only=True)
+            self._all_readers.append(db)
+            self._readers.put_nowait(db)
+        self._watcher = await self._connect(read_only=True)
+        self._seen_version = await self._data_version()
+
+    async def close(self):
+        for db in self._all_readers:
+            await db.close()
+        self._all_readers.clear()
+        self._readers = asyncio.Queue()
+        if self._watcher is not None:
+            await self._watcher.close()
+            self._watcher = None
+        if self._writer is not None:
+            await self._writer.close()
+            self._writer = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+
+    def _check_open(self):
+        if self._writer is None:
+            raise RuntimeError(f"SQLite pool for {self.path.name} is not open")
+
+    @asynccontextmanager
+    async def read(self):
+        """Borrow a read-only connection."""
+        self._check_open()
+        db = await self._readers.get()
+        try:
+            yield db
+        finally:
+            self._readers.put_nowait(db)
+
+    @asynccontextmanager
+    async def write(self):
+        """Hold the writer for one transaction; commits on success, rolls back on error."""
+        self._check_open()
+        async with self._write_lock:
+            # The writer's data_version only moves for other processes' commits,
+            # so comparing it across the write spots one landing mid-write
+            writer_before = await self._data_version(self._writer)
+            before = await self._data_version()
+            try:
+                yield self._writer
+                await self._writer.commit()
+            except BaseException:
+                try:
+                    await self._writer.rollback()
+                except sqlite3.Error:
+                    pass
+                raise
+            after = await self._data_version()
+            writer_after = await self._data_version(self._writer)
+            # Only absorb our own commit; if another process committed before
+            # or during it, leave _seen_version so changed_externally() fires
+            if before == self._seen_version and writer_after == writer_before:
+                self._seen_version = after
+
+    async def _data_version(self, db: Optional[aiosqlite.Connection] = None) -> int:
+        async with (db or self._watcher).execute("PRAGMA data_version") as cursor:
+            row = await cursor.fetchone()
+        return row[0]
+
+    async def changed_externally(self) -> bool:
+        """
+        True if another process has committed to the file since the last
+        check. Runs on the watcher connection, so it never waits on writes;
+        this pool's own commits don't count unless another process's commit
+        may be mixed in with them.
+        """
+        self._check_open()
+        version = await self._data_version()
+        if version == self._seen_version:
+            return False
+        self._seen_version = version
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "open": self.is_open,
+            "readers": self.size,
+            "idle_readers": self._readers.qsize(),
+            "writer_busy": self._write_lock.locked(),
+        }
@@ -6,208 +6,390 @@ Stores persistent user information:
 - Name, personality traits, preferences
 - Long-term facts the AI should always remember
 - Communication style preferences
+
+Queries go through a long-lived SQLitePool (one writer, several readers)
+opened in init_supermemory and closed in close_supermemory.
+
+build_user_context runs on every chat turn, so its output is cached per
+user (USER_CONTEXT_CACHE_MAX_ENTRIES, optional USER_CONTEXT_CACHE_TTL).
+Profile and fact writes in this worker update or drop the entry; writes
+from other workers are picked up through SQLite's data_version, checked
+at most every USER_CONTEXT_VERSION_CHECK_INTERVAL seconds.
 """
 
 import os
 import json
+import time
 import uuid
-import aiosqlite
+import base64
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
+from services.cache import TTLCache
+from services.sqlite_migrations import Migration, create_index, migrate
+from services.sqlite_pool import SQLitePool
+
 DB_PATH = Path(__file__).parent.parent / "supermemory.db"
 
+USER_CONTEXT_CACHE_MAX_ENTRIES = int(os.getenv("USER_CONTEXT_CACHE_MAX_ENTRIES", "4096"))
+USER_CONTEXT_CACHE_TTL = float(os.getenv("USER_CONTEXT_CACHE_TTL", "0"))  # 0 = no expiry
+USER_CONTEXT_VERSION_CHECK_INTERVAL = float(os.getenv("USER_CONTEXT_VERSION_CHECK_INTERVAL", "1.0"))
+
+# Print pending schema migrations at startup instead of applying them;
+# startup is refused while any are pending
+SUPERMEMORY_MIGRATIONS_DRY_RUN = os.getenv("SUPERMEMORY_MIGRATIONS_DRY_RUN", "false").lower() == "true"
+
+CONTEXT_FACT_LIMIT = 20
+FACTS_PAGE_SIZE = 100
+FACTS_MAX_PAGE_SIZE = 500
+
+_db = SQLitePool(DB_PATH)
+
+_context_cache = TTLCache(
+    max_entries=USER_CONTEXT_CACHE_MAX_ENTRIES,
+    ttl=USER_CONTEXT_CACHE_TTL if USER_CONTEXT_CACHE_TTL > 0 else float("inf"),
+)
+# Bumped on every invalidation so a read that raced a write isn't cached
+_context_generation = 0
+_data_version_checked_at = 0.0
+
+
+# ─── Schema ───────────────────────────────────────────────────────────────────
+# Append new migrations with the next version number; never edit or
+# reorder ones that have shipped. One index build per migration.
+
+MIGRATIONS = [
+    Migration(1, "initial_schema", (
+        """
+        CREATE TABLE IF NOT EXISTS user_profiles (
+            user_id TEXT PRIMARY KEY,
+            name TEXT,
+            personality TEXT DEFAULT '{}',
+            preferences TEXT DEFAULT '{}',
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_facts (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            category TEXT NOT NULL,
+            content TEXT NOT NULL,
+            importance INTEGER DEFAULT 5,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES user_profiles(user_id)
+        )
+        """,
+        create_index("idx_facts_user", "user_facts", "user_id"),
+        create_index("idx_facts_category", "user_facts", "category"),
+    )),
+    # Ranked fact reads seek straight to a user's (and category's) facts
+    # in FACT_ORDER, so neither listing nor pagination needs a sort step
+    Migration(2, "facts_user_category_rank_index", (
+        create_index(
+            "idx_facts_user_category_rank", "user_facts",
+            "user_id, category, importance DESC, created_at, id",
+        ),
+    )),
+    Migration(3, "facts_user_rank_index", (
+        create_index("idx_facts_user_rank", "user_facts", "user_id, importance DESC, created_at, id"),
+    )),
+    # Superseded by the rank indexes (same leading column)
+    Migration(4, "drop_facts_user_index", (
+        "DROP INDEX IF EXISTS idx_facts_user",
+    )),
+]
+
 
 async def init_supermemory():
-    """Initialize the SQLite database for user profiles."""
-    async with aiosqlite.connect(str(DB_PATH)) as db:
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS user_profiles (
-                user_id TEXT PRIMARY KEY,
-                name TEXT,
-                personality TEXT DEFAULT '{}',
-                preferences TEXT DEFAULT '{}',
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL
-            )
-        """)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS user_facts (
-                id TEXT PRIMARY KEY,
-                user_id TEXT NOT NULL,
-                category TEXT NOT NULL,
-                content TEXT NOT NULL,
-                importance INTEGER DEFAULT 5,
-                created_at TEXT NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES user_profiles(user_id)
-            )
-        """)
-        await db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_facts_user ON user_facts(user_id)
-        """)
-        await db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_facts_category ON user_facts(category)
-        """)
-        await db.commit()
-    print(f"✅ SuperMemory DB initialized at {DB_PATH}")
+    """Open the connection pool and bring the schema up to date."""
+    await _db.open()
+    plan = await migrate(_db, MIGRATIONS, dry_run=SUPERMEMORY_MIGRATIONS_DRY_RUN)
+    if plan["dry_run"] and plan["pending"]:
+        # Serving against a missing or outdated schema would fail every call
+        await _db.close()
+        versions = ", ".join(f"v{m['version']}" for m in plan["pending"])
+        print(f"❌ SuperMemory schema is behind ({versions} pending); refusing to start in dry-run mode")
+        raise RuntimeError(
+            f"SuperMemory migrations pending ({versions}); unset SUPERMEMORY_MIGRATIONS_DRY_RUN to apply them"
+        )
+    print(f"✅ SuperMemory DB initialized at {DB_PATH} ({_db.size} readers)")
+
+
+async def migrate_supermemory(dry_run: bool = True) -> dict:
+    """Plan (or with dry_run=False, apply) pending SuperMemory migrations."""
+    return await migrate(_db, MIGRATIONS, dry_run=dry_run)
+
+
+async def close_supermemory():
+    """Close the pooled connections."""
+    await _db.close()
+    _context_cache.clear()
+
+
+# ─── User Context Cache ───────────────────────────────────────────────────────
+
+def _invalidate_user_context(user_id: Optional[str] = None):
+    """Drop one user's cached context, or every entry when user_id is None."""
+    global _context_generation
+    _context_generation += 1
+    if user_id is None:
+        _context_cache.clear()
+    else:
+        _context_cache.invalidate(user_id)
+
+
+async def _sync_data_version():
+    """Clear the context cache if another worker has written to the database."""
+    global _data_version_checked_at
+    now = time.monotonic()
+    if now - _data_version_checked_at < USER_CONTEXT_VERSION_CHECK_INTERVAL:
+        return
+    _data_version_checked_at = now
+    if await _db.changed_externally():
+        _invalidate_user_context()
+
+
+def get_user_context_cache_stats() -> dict:
+    """Hit/miss counters for the build_user_context cache."""
+    return _context_cache.stats()
 
 
 # ─── User Profile CRUD ────────────────────────────────────────────────────────
 
-async def get_user_profile(user_id: str) -> Optional[dict]:
-    """Get a user's full profile including facts."""
-    async with aiosqlite.connect(str(DB_PATH)) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
+def _profile_from_row(row) -> dict:
+    return {
+        "user_id": row["user_id"],
+        "name": row["name"],
+        "personality": json.loads(row["personality"]),
+        "preferences": json.loads(row["preferences"]),
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+
+
+def _fact_from_row(row) -> dict:
+    return {
+        "id": row["id"],
+        "category": row["category"],
+        "content": row["content"],
+        "importance": row["importance"],
+        "created_at": row["created_at"],
+    }
+
+
+# Most important first; ties broken oldest-first, then by id, so the order
+# is total and keyset pagination never skips or repeats a fact
+FACT_ORDER = "importance DESC, created_at, id"
+
+
+def _encode_facts_cursor(fact: dict) -> str:
+    key = json.dumps([fact["importance"], fact["created_at"], fact["id"]])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def _decode_facts_cursor(cursor: str) -> tuple:
+    try:
+        importance, created_at, fact_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    return importance, created_at, fact_id
+
+
+async def _fetch_facts(db, user_id: str, limit: Optional[int] = None) -> list[dict]:
+    query = f"SELECT * FROM user_facts WHERE user_id = ? ORDER BY {FACT_ORDER}"
+    params: tuple = (user_id,)
+    if limit is not None:
+        query += " LIMIT ?"
+        params += (limit,)
+    async with db.execute(query, params) as cursor:
+        return [_fact_from_row(f) for f in await cursor.fetchall()]
+
+
+async def get_user_profile(user_id: str, fact_limit: Optional[int] = None) -> Optional[dict]:
+    """Get a user's full profile including facts (the top `fact_limit` if given)."""
+    async with _db.read() as db:
+        async with db.execute(
             "SELECT * FROM user_profiles WHERE user_id = ?", (user_id,)
-        )
-        row = await cursor.fetchone()
+        ) as cursor:
+            row = await cursor.fetchone()
         if not row:
             return None
 
-        profile = {
-            "user_id": row["user_id"],
-            "name": row["name"],
-            "personality": json.loads(row["personality"]),
-            "preferences": json.loads(row["preferences"]),
-            "created_at": row["created_at"],
-            "updated_at": row["updated_at"],
-        }
-
-        # Get associated facts
-        cursor = await db.execute(
-            "SELECT * FROM user_facts WHERE user_id = ? ORDER BY importance DESC",
-            (user_id,),
-        )
-        facts = await cursor.fetchall()
-        profile["facts"] = [
-            {
-                "id": f["id"],
-                "category": f["category"],
-                "content": f["content"],
-                "importance": f["importance"],
-                "created_at": f["created_at"],
-            }
-            for f in facts
-        ]
+        profile = _profile_from_row(row)
+        profile["facts"] = await _fetch_facts(db, user_id, fact_limit)
         return profile
 
 
+# Personality/preferences are merged with json_patch (RFC 7396): nested
+# objects merge and a null value removes the key
+_UPSERT_PROFILE_SQL = """
+    INSERT INTO user_profiles (user_id, name, personality, preferences, created_at, updated_at)
+    VALUES (:user_id, COALESCE(:name, ''), json_patch('{}', :personality),
+            json_patch('{}', :preferences), :now, :now)
+    ON CONFLICT(user_id) DO UPDATE SET
+        name = COALESCE(:name, user_profiles.name),
+        personality = json_patch(user_profiles.personality, :personality),
+        preferences = json_patch(user_profiles.preferences, :preferences),
+        updated_at = :now
+    RETURNING *
+"""
+
+_ENSURE_PROFILE_SQL = """
+    INSERT INTO user_profiles (user_id, name, personality, preferences, created_at, updated_at)
+    VALUES (?, '', '{}', '{}', ?, ?)
+    ON CONFLICT(user_id) DO NOTHING
+"""
+
+_INSERT_FACT_SQL = """
+    INSERT INTO user_facts (id, user_id, category, content, importance, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
 async def upsert_user_profile(
     user_id: str,
     name: Optional[str] = None,
     personality: Optional[dict] = None,
     preferences: Optional[dict] = None,
 ) -> dict:
-    """Create or update a user profile."""
-    now = datetime.utcnow().isoformat()
-    async with aiosqlite.connect(str(DB_PATH)) as db:
-        existing = await get_user_profile(user_id)
-        if existing:
-            updates = []
-            params = []
-            if name is not None:
-                updates.append("name = ?")
-                params.append(name)
-            if personality is not None:
-                merged = {**existing.get("personality", {}), **personality}
-                updates.append("personality = ?")
-                params.append(json.dumps(merged))
-            if preferences is not None:
-                merged = {**existing.get("preferences", {}), **preferences}
-                updates.append("preferences = ?")
-                params.append(json.dumps(merged))
-            updates.append("updated_at = ?")
-            params.append(now)
-            params.append(user_id)
-
-            await db.execute(
-                f"UPDATE user_profiles SET {', '.join(updates)} WHERE user_id = ?",
-                params,
-            )
-        else:
-            await db.execute(
-                """INSERT INTO user_profiles (user_id, name, personality, preferences, created_at, updated_at)
-                   VALUES (?, ?, ?, ?, ?, ?)""",
-                (
-                    user_id,
-                    name or "",
-                    json.dumps(personality or {}),
-                    json.dumps(preferences or {}),
-                    now,
-                    now,
-                ),
-            )
-        await db.commit()
-
-    return await get_user_profile(user_id) or {"user_id": user_id}
+    """Create or update a user profile in a single statement."""
+    params = {
+        "user_id": user_id,
+        "name": name,
+        "personality": json.dumps(personality or {}),
+        "preferences": json.dumps(preferences or {}),
+        "now": datetime.utcnow().isoformat(),
+    }
+    async with _db.write() as db:
+        async with db.execute(_UPSERT_PROFILE_SQL, params) as cursor:
+            row = await cursor.fetchone()
+    profile = _profile_from_row(row)
+    _invalidate_user_context(user_id)
+    generation = _context_generation
+
+    # Facts are read after commit on a reader, so the write lock isn't held
+    # while a heavy user's facts load
+    async with _db.read() as db:
+        profile["facts"] = await _fetch_facts(db, user_id)
+
+    if generation == _context_generation:
+        # Write-through: the next chat turn gets the new context without a query
+        top = {**profile, "facts": profile["facts"][:CONTEXT_FACT_LIMIT]}
+        _context_cache.set(user_id, _format_user_context(top))
+    return profile
 
 
 async def add_user_fact(
     user_id: str, category: str, content: str, importance: int = 5
 ) -> dict:
     """Add a fact about the user (e.g., 'name', 'hobby', 'work', 'preference')."""
-    fact_id = str(uuid.uuid4())
+    return (await add_user_facts(user_id, [
+        {"category": category, "content": content, "importance": importance}
+    ]))[0]
+
+
+async def add_user_facts(user_id: str, facts: list[dict]) -> list[dict]:
+    """
+    Add many facts about a user in one transaction, creating the profile
+    if needed. Each fact is a dict with category, content and optional
+    importance (default 5).
+    """
     now = datetime.utcnow().isoformat()
+    added = [
+        {
+            "id": str(uuid.uuid4()),
+            "category": f["category"],
+            "content": f["content"],
+            "importance": f.get("importance", 5),
+        }
+        for f in facts
+    ]
+    if not added:
+        return []
 
-    # Ensure profile exists
-    profile = await get_user_profile(user_id)
-    if not profile:
-        await upsert_user_profile(user_id)
+    async with _db.write() as db:
+        await db.execute(_ENSURE_PROFILE_SQL, (user_id, now, now))
+        await db.executemany(_INSERT_FACT_SQL, [
+            (f["id"], user_id, f["category"], f["content"], f["importance"], now)
+            for f in added
+        ])
+    _invalidate_user_context(user_id)
+    return added
 
-    async with aiosqlite.connect(str(DB_PATH)) as db:
-        await db.execute(
-            """INSERT INTO user_facts (id, user_id, category, content, importance, created_at)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (fact_id, user_id, category, content, importance, now),
+
+async def get_user_facts(
+    user_id: str,
+    category: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> dict:
+    """
+    Get facts about a user, optionally filtered by category. Without a
+    `limit` or `cursor` every fact is returned; otherwise one page is, and
+    the returned `next_cursor` fetches the next one (None on the last page).
+    Raises ValueError for a malformed cursor.
+    """
+    paged = limit is not None or cursor is not None
+    limit = max(1, min(FACTS_PAGE_SIZE if limit is None else limit, FACTS_MAX_PAGE_SIZE))
+    where = ["user_id = ?"]
+    params: list = [user_id]
+    if category:
+        where.append("category = ?")
+        params.append(category)
+    if cursor:
+        importance, created_at, fact_id = _decode_facts_cursor(cursor)
+        where.append(
+            "(importance < ? OR (importance = ? AND (created_at > ? OR (created_at = ? AND id > ?))))"
         )
-        await db.commit()
-
-    return {"id": fact_id, "category": category, "content": content, "importance": importance}
-
-
-async def get_user_facts(user_id: str, category: Optional[str] = None) -> list[dict]:
-    """Get facts about a user, optionally filtered by category."""
-    async with aiosqlite.connect(str(DB_PATH)) as db:
-        db.row_factory = aiosqlite.Row
-        if category:
-            cursor = await db.execute(
-                "SELECT * FROM user_facts WHERE user_id = ? AND category = ? ORDER BY importance DESC",
-                (user_id, category),
-            )
-        else:
-            cursor = await db.execute(
-                "SELECT * FROM user_facts WHERE user_id = ? ORDER BY importance DESC",
-                (user_id,),
-            )
-        rows = await cursor.fetchall()
-        return [
-            {
-                "id": r["id"],
-                "category": r["category"],
-                "content": r["content"],
-                "importance": r["importance"],
-                "created_at": r["created_at"],
-            }
-            for r in rows
-        ]
+        params += [importance, importance, created_at, created_at, fact_id]
+
+    query = f"SELECT * FROM user_facts WHERE {' AND '.join(where)} ORDER BY {FACT_ORDER}"
+    if paged:
+        # Fetch one extra row to know whether another page exists
+        query += " LIMIT ?"
+        params.append(limit + 1)
+    async with _db.read() as db:
+        async with db.execute(query, params) as cur:
+            rows = await cur.fetchall()
+
+    if not paged:
+        return {"facts": [_fact_from_row(r) for r in rows], "next_cursor": None}
+    facts = [_fact_from_row(r) for r in rows[:limit]]
+    next_cursor = _encode_facts_cursor(facts[-1]) if len(rows) > limit else None
+    return {"facts": facts, "next_cursor": next_cursor}
 
 
 async def delete_user_fact(fact_id: str) -> dict:
     """Delete a user fact."""
-    async with aiosqlite.connect(str(DB_PATH)) as db:
-        await db.execute("DELETE FROM user_facts WHERE id = ?", (fact_id,))
-        await db.commit()
+    async with _db.write() as db:
+        async with db.execute(
+            "DELETE FROM user_facts WHERE id = ? RETURNING user_id", (fact_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+    if row:
+        _invalidate_user_context(row["user_id"])
     return {"message": "Fact deleted", "id": fact_id}
 
 
 async def build_user_context(user_id: str) -> str:
     """Build a context string about the user for injection into system prompts."""
-    profile = await get_user_profile(user_id)
-    if not profile:
-        return ""
+    await _sync_data_version()
+    cached = _context_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    generation = _context_generation
+    profile = await get_user_profile(user_id, fact_limit=CONTEXT_FACT_LIMIT)
+    context = _format_user_context(profile) if profile else ""
+    if generation == _context_generation:
+        _context_cache.set(user_id, context)
+    return context
+
 
+def _format_user_context(profile: dict) -> str:
     parts = []
     if profile.get("name"):
         parts.append(f"The user's name is {profile['name']}.")
@@ -224,7 +406,7 @@ async def build_user_context(user_id: str) -> str:
 
     facts = profile.get("facts", [])
     if facts:
-        fact_lines = [f"- {f['content']}" for f in facts[:20]]
+        fact_lines = [f"- {f['content']}" for f in facts[:CONTEXT_FACT_LIMIT]]
         parts.append("Known facts about the user:\n" + "\n".join(fact_lines))
 
     return "\n".join(parts)
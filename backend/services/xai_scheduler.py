@@ -0,0 +1,240 @@
+"""
+xAI Scheduler — Process-wide rate limiting for api.x.ai chat calls
+Every xAI request goes through one scheduler so concurrent collaborations
+and searches don't trigger 429 storms:
+- token bucket caps the request rate (XAI_RATE_LIMIT_RPS / XAI_RATE_BURST)
+- AIMD concurrency cap: +1/limit per success, halved on 429/503
+- Retry-After pauses every caller, not just the one that got throttled
+- jittered exponential backoff retries (XAI_MAX_RETRIES)
+- interactive requests are admitted before background work
+"""
+
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import httpx
+
+from services.http_client import get_http_client, XAI_BASE_URL
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+THROTTLE_STATUS = {429, 503}
+
+# Inherited by tasks spawned from the caller, so a whole collaboration
+# can be marked as background work in one place
+_priority: ContextVar[int] = ContextVar("xai_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def background_priority():
+    """Run xAI calls made inside this block at background priority."""
+    token = _priority.set(PRIORITY_BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def _retry_after_seconds(resp: httpx.Response) -> Optional[float]:
+    value = resp.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class XAIScheduler:
+    """Token bucket + AIMD concurrency limiter with priority admission."""
+
+    def __init__(
+        self,
+        rate: float = 8.0,
+        burst: float = 16.0,
+        min_concurrency: int = 2,
+        max_concurrency: int = 32,
+        initial_concurrency: int = 16,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = float(initial_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._tokens = burst
+        self._refilled_at = time.monotonic()
+        self._active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+
+        self.throttled = 0
+        self.retries = 0
+
+    @classmethod
+    def from_env(cls) -> "XAIScheduler":
+        return cls(
+            rate=float(os.getenv("XAI_RATE_LIMIT_RPS", "8")),
+            burst=float(os.getenv("XAI_RATE_BURST", "16")),
+            min_concurrency=int(os.getenv("XAI_MIN_CONCURRENCY", "2")),
+            max_concurrency=int(os.getenv("XAI_MAX_CONCURRENCY", "32")),
+            initial_concurrency=int(os.getenv("XAI_INITIAL_CONCURRENCY", "16")),
+            max_retries=int(os.getenv("XAI_MAX_RETRIES", "4")),
+        )
+
+    # ── Admission ──
+
+    def _wake_waiters(self):
+        while self._waiters and self._active < int(self.limit):
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                self._active += 1
+                fut.set_result(None)
+
+    async def _acquire(self, priority: int):
+        if self._active < int(self.limit) and not self._waiters:
+            self._active += 1
+        else:
+            entry = (priority, next(self._seq), asyncio.get_running_loop().create_future())
+            heapq.heappush(self._waiters, entry)
+            try:
+                await entry[2]
+            except asyncio.CancelledError:
+                if entry[2].done() and not entry[2].cancelled():
+                    # Slot was handed over just as we were cancelled
+                    self._release()
+                elif entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                raise
+
+        try:
+            await self._wait_for_token()
+        except BaseException:
+            self._release()
+            raise
+
+    def _release(self):
+        self._active -= 1
+        self._wake_waiters()
+
+    async def _wait_for_token(self):
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[int] = None):
+        await self._acquire(_priority.get() if priority is None else priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+    # ── Feedback ──
+
+    def _on_success(self):
+        self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        self._wake_waiters()
+
+    def _on_failure(self, attempt: int, resp: Optional[httpx.Response]) -> float:
+        """Adjust limits for a failed attempt and return how long to back off."""
+        retry_after = None
+        if resp is not None and resp.status_code in THROTTLE_STATUS:
+            self.throttled += 1
+            now = time.monotonic()
+            # Halve at most once per second so a burst of 429s isn't a collapse
+            if now - self._last_decrease > 1.0:
+                self.limit = max(self.min_concurrency, self.limit / 2)
+                self._last_decrease = now
+            retry_after = _retry_after_seconds(resp)
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(backoff, retry_after or 0.0)
+
+    # ── Requests ──
+
+    async def post(self, path: str, priority: Optional[int] = None, **kwargs) -> httpx.Response:
+        """POST to api.x.ai with admission control and retries."""
+        client = get_http_client(XAI_BASE_URL)
+        for attempt in range(self.max_retries + 1):
+            resp = None
+            async with self.slot(priority):
+                try:
+                    resp = await client.post(path, **kwargs)
+                except httpx.TransportError:
+                    if attempt == self.max_retries:
+                        raise
+                else:
+                    if resp.status_code not in RETRYABLE_STATUS or attempt == self.max_retries:
+                        if resp.is_success:
+                            self._on_success()
+                        return resp
+            self.retries += 1
+            await asyncio.sleep(self._on_failure(attempt, resp))
+
+    @asynccontextmanager
+    async def stream(self, path: str, priority: Optional[int] = None, **kwargs):
+        """Streaming POST; retries only happen before the first byte is read."""
+        client = get_http_client(XAI_BASE_URL)
+        for attempt in range(self.max_retries + 1):
+            resp = None
+            async with self.slot(priority):
+                try:
+                    async with client.stream("POST", path, **kwargs) as resp:
+                        if resp.status_code not in RETRYABLE_STATUS or attempt == self.max_retries:
+                            if resp.is_success:
+                                self._on_success()
+                            yield resp
+                            return
+                except httpx.TransportError:
+                    if resp is not None or attempt == self.max_retries:
+                        raise
+            self.retries += 1
+            await asyncio.sleep(self._on_failure(attempt, resp))
+
+    def stats(self) -> dict:
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "active": self._active,
+            "queued": len(self._waiters),
+            "tokens": round(self._tokens, 2),
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 2),
+            "throttled": self.throttled,
+            "retries": self.retries,
+        }
+
+
+xai_scheduler = XAIScheduler.from_env()
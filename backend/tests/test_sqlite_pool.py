@@ -0,0 +1,42 @@
+import asyncio
+import sqlite3
+
+from services.sqlite_pool import SQLitePool
+
+
+def _external_write(path):
+    db = sqlite3.connect(path)
+    db.execute("INSERT INTO t (v) VALUES ('external')")
+    db.commit()
+    db.close()
+
+
+async def _local_write(pool):
+    async with pool.write() as db:
+        await db.execute("INSERT INTO t (v) VALUES ('local')")
+
+
+def test_changed_externally(tmp_path):
+    path = tmp_path / "pool.db"
+
+    async def scenario():
+        pool = SQLitePool(path, readers=1)
+        await pool.open()
+        try:
+            async with pool.write() as db:
+                await db.execute("CREATE TABLE t (v TEXT)")
+            assert not await pool.changed_externally()
+
+            # Our own commits don't count
+            await _local_write(pool)
+            assert not await pool.changed_externally()
+
+            # An external commit followed by a local one must still be reported
+            _external_write(path)
+            await _local_write(pool)
+            assert await pool.changed_externally()
+            assert not await pool.changed_externally()
+        finally:
+            await pool.close()
+
+    asyncio.run(scenario())